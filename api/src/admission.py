@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import math
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from .config import settings
+
+
+class IngestAdmission:
+    """限制同时处理中的写入请求数与行数，超限时以 429 拒绝。
+
+    Retry-After 由当前积压行数除以观测到的排空速率（行/秒，EWMA）得出。
+    """
+
+    def __init__(self, max_rows: int, max_requests: int, alpha: float = 0.2) -> None:
+        self.max_rows = max_rows
+        self.max_requests = max_requests
+        self._alpha = alpha
+        self._rows = 0
+        self._requests = 0
+        self._drain_rate: float | None = None
+
+    def _has_room(self, rows: int) -> bool:
+        # 空闲时总是放行一个请求，避免超大批次永远无法写入
+        if self._requests == 0:
+            return True
+        return self._requests < self.max_requests and self._rows + rows <= self.max_rows
+
+    def retry_after_s(self, rows: int) -> int:
+        if not self._drain_rate:
+            return 1
+        return max(1, min(60, math.ceil((self._rows + rows) / self._drain_rate)))
+
+    def _observe(self, rows: int, elapsed_s: float, concurrency: int) -> None:
+        rate = rows / max(elapsed_s, 1e-3) * max(1, concurrency)
+        if self._drain_rate is None:
+            self._drain_rate = rate
+        else:
+            self._drain_rate += self._alpha * (rate - self._drain_rate)
+
+    @asynccontextmanager
+    async def admit(self, rows: int):
+        if not self._has_room(rows):
+            raise HTTPException(
+                status_code=429,
+                detail="写入繁忙，请稍后重试",
+                headers={"Retry-After": str(self.retry_after_s(rows))},
+            )
+        self._rows += rows
+        self._requests += 1
+        concurrency = self._requests
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self._rows -= rows
+            self._requests -= 1
+            self._observe(rows, time.monotonic() - t0, concurrency)
+
+
+ingest_admission = IngestAdmission(
+    max_rows=settings.ingest_max_inflight_rows,
+    max_requests=settings.ingest_max_inflight_requests,
+)
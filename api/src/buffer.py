@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+import psycopg
+
+from .config import settings
+from .ingest import PreparedBatch, apply_batches
+from .models import IngestResponse
+
+
+logger = logging.getLogger(__name__)
+
+# enqueue 模式下暂时性错误的最大重试次数
+_MAX_RETRIES = 3
+
+_Item = Tuple[PreparedBatch, Optional[asyncio.Future], int]
+
+
+def _is_transient(exc: BaseException) -> bool:
+    # 连接失败、连接池超时（PoolTimeout 也是 OperationalError）、死锁与序列化冲突
+    return isinstance(exc, psycopg.OperationalError)
+
+
+class IngestBuffer:
+    """服务端写入缓冲（group commit）：合并多个请求、多个序列的行，定时或定量一次性写入。
+
+    ack 模式：
+    - ``flush``：请求在包含它的那次写入提交后才返回（持久化后确认）
+    - ``enqueue``：请求进入内存队列即返回；进程崩溃会丢失尚未写入的数据
+    """
+
+    def __init__(self, flush_ms: int, max_rows: int, max_pending_rows: int, ack: str) -> None:
+        if ack not in ("flush", "enqueue"):
+            raise ValueError(f"unknown ingest buffer ack mode: {ack}")
+        self.flush_ms = flush_ms
+        self.max_rows = max_rows
+        self.max_pending_rows = max_pending_rows
+        self.ack = ack
+        self._pending: List[_Item] = []
+        self._pending_rows = 0
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"requests": 0, "rows": 0, "flushes": 0, "failed_flushes": 0, "dropped": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # 关闭前写完队列中剩余的数据
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, batch: PreparedBatch) -> IngestResponse:
+        rows = len(batch.raw_rows)
+        if self._closing:
+            raise HTTPException(status_code=503, detail="服务正在关闭，请稍后重试")
+        if self._pending_rows and self._pending_rows + rows > self.max_pending_rows:
+            raise HTTPException(
+                status_code=429,
+                detail="写入缓冲已满，请稍后重试",
+                headers={"Retry-After": str(max(1, math.ceil(self.flush_ms / 1000)))},
+            )
+        fut = asyncio.get_running_loop().create_future() if self.ack == "flush" else None
+        self._pending.append((batch, fut, 0))
+        self._pending_rows += rows
+        self.stats["requests"] += 1
+        if self._pending_rows >= self.max_rows:
+            self._wake.set()
+        if fut is not None:
+            resp = await fut
+        else:
+            resp = IngestResponse(stored_raw=rows, stored_min1=len(batch.min1_rows))
+        return resp.model_copy(update={"buffered": True})
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending:
+                await self._flush()
+            if self._closing and not self._pending:
+                return
+
+    async def _flush(self) -> None:
+        items, self._pending = self._pending, []
+        self._pending_rows = 0
+        await self._apply(items)
+
+    async def _apply(self, items: List[_Item]) -> None:
+        try:
+            results = await apply_batches([b for b, _, _ in items])
+        except Exception as exc:
+            self.stats["failed_flushes"] += 1
+            if _is_transient(exc):
+                logger.warning("ingest buffer flush failed (%d requests): %r", len(items), exc)
+                self._retry(items, exc)
+            elif len(items) > 1:
+                # 合并写入失败时二分定位出错的批次，其余批次照常写入
+                mid = len(items) // 2
+                await self._apply(items[:mid])
+                await self._apply(items[mid:])
+            else:
+                self._reject(items[0], exc)
+            return
+        self.stats["flushes"] += 1
+        self.stats["rows"] += sum(len(b.raw_rows) for b, _, _ in items)
+        for (_, fut, _), res in zip(items, results):
+            if fut is None or fut.done():
+                continue
+            if isinstance(res, Exception):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+    def _retry(self, items: List[_Item], exc: BaseException) -> None:
+        # flush 模式向等待中的请求返回 503 + Retry-After（客户端重试是幂等的）；
+        # enqueue 模式放回队列，次数有限
+        unavailable = HTTPException(
+            status_code=503,
+            detail="数据库暂时不可用，请稍后重试",
+            headers={"Retry-After": str(max(1, math.ceil(self.flush_ms / 1000)))},
+        )
+        retry = []
+        for batch, fut, attempts in items:
+            if fut is not None:
+                self._reject((batch, fut, attempts), unavailable)
+            elif attempts < _MAX_RETRIES:
+                retry.append((batch, fut, attempts + 1))
+            else:
+                self._reject((batch, fut, attempts), exc)
+        if retry:
+            self._pending = retry + self._pending
+            self._pending_rows += sum(len(b.raw_rows) for b, _, _ in retry)
+
+    def _reject(self, item: _Item, exc: BaseException) -> None:
+        batch, fut, _ = item
+        if fut is not None:
+            if not fut.done():
+                fut.set_exception(exc)
+            return
+        self.stats["dropped"] += 1
+        logger.error(
+            "ingest buffer dropped batch %s/%s (%d rows, key %s): %r",
+            batch.source, batch.parameter, len(batch.raw_rows), batch.batch_key, exc,
+        )
+
+
+ingest_buffer = IngestBuffer(
+    flush_ms=settings.ingest_buffer_flush_ms,
+    max_rows=settings.ingest_buffer_max_rows,
+    max_pending_rows=settings.ingest_buffer_max_pending_rows,
+    ack=settings.ingest_buffer_ack,
+)
@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel
 import os
 
@@ -10,6 +12,37 @@ class Settings(BaseModel):
     db_password: str = os.getenv("DB_PASSWORD", "swlpass")
     db_sslmode: str = os.getenv("DB_SSLMODE", "disable")
     api_port: int = int(os.getenv("API_PORT", "8080"))
+    # 管理员令牌：为空时禁用 profiling 模式
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    # 慢请求阈值（毫秒），超过时记录分阶段耗时与 EXPLAIN；0 表示关闭
+    slow_request_ms: int = int(os.getenv("SLOW_REQUEST_MS", "2000"))
+    # 覆盖索引合并容差：相邻样本间隔不超过该值视为连续
+    coverage_max_gap_ms: int = int(os.getenv("COVERAGE_MAX_GAP_MS", "300000"))
+    # 幂等键/批次内容哈希的保留时长（小时），超时后同一批次会被重新写入
+    ingest_dedup_retention_h: int = int(os.getenv("INGEST_DEDUP_RETENTION_H", "72"))
+    # 写入准入控制：同时处理中的行数/请求数上限（连接池上限为 10，需给查询留出余量）
+    ingest_max_inflight_rows: int = int(os.getenv("INGEST_MAX_INFLIGHT_ROWS", "50000"))
+    ingest_max_inflight_requests: int = int(os.getenv("INGEST_MAX_INFLIGHT_REQUESTS", "6"))
+    # 写入缓冲（group commit）：多个小请求合并为一次批量写入
+    ingest_buffer_enabled: bool = os.getenv("INGEST_BUFFER_ENABLED", "false").lower() in ("1", "true", "yes")
+    ingest_buffer_flush_ms: int = int(os.getenv("INGEST_BUFFER_FLUSH_MS", "200"))
+    ingest_buffer_max_rows: int = int(os.getenv("INGEST_BUFFER_MAX_ROWS", "20000"))
+    ingest_buffer_max_pending_rows: int = int(os.getenv("INGEST_BUFFER_MAX_PENDING_ROWS", "200000"))
+    ingest_buffer_ack: str = os.getenv("INGEST_BUFFER_ACK", "flush")
+    # 大区间查询：按 chunk 切分后每个请求最多并发的子查询数
+    query_max_concurrency: int = int(os.getenv("QUERY_MAX_CONCURRENCY", "4"))
+    # 区间长度至少为该数量的 chunk 时才切分并发查询，较短的区间单次扫描
+    query_split_min_chunks: int = int(os.getenv("QUERY_SPLIT_MIN_CHUNKS", "4"))
+    # 借助覆盖索引跳过没有数据的 raw 子区间；已有数据的库须先执行 sql/init.sql 中的覆盖索引回填
+    query_skip_uncovered: bool = os.getenv("QUERY_SKIP_UNCOVERED", "false").lower() in ("1", "true", "yes")
+    # 在写入时物化到 min1 表的衍生参数（逗号分隔，如 B_mag,Pdyn）
+    derived_materialize: List[str] = [
+        n.strip() for n in os.getenv("DERIVED_MATERIALIZE", "").split(",") if n.strip()
+    ]
+    # min1 存储布局：rows 为每分钟一行；daily 为每序列每 UTC 日一行 float8[1440] 数组
+    min1_storage: str = os.getenv("MIN1_STORAGE", "rows")
+    # 实时订阅：每个订阅者的消息队列长度，满后丢弃最旧消息
+    live_queue_size: int = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
 
     def dsn(self) -> str:
         return (
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+# 区间统一用 Unix 毫秒表示，闭区间 [start_ms, end_ms]
+Interval = Tuple[int, int]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+
+
+def to_ms(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // _MS
+
+
+def from_ms(ms: int) -> datetime:
+    return _EPOCH + ms * _MS
+
+
+def intervals_from_times(times_ms: Sequence[int], max_gap_ms: int) -> List[Interval]:
+    """把采样时刻切分为覆盖区间：相邻样本间隔超过 max_gap_ms 即视为缺口。"""
+    if len(times_ms) == 0:
+        return []
+    ts = np.unique(np.asarray(times_ms, dtype=np.int64))
+    breaks = np.flatnonzero(np.diff(ts) > max_gap_ms)
+    starts = np.concatenate((ts[:1], ts[breaks + 1]))
+    ends = np.concatenate((ts[breaks], ts[-1:]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def merge_intervals(intervals: Iterable[Interval], max_gap_ms: int) -> List[Interval]:
+    merged: List[Interval] = []
+    for s, e in sorted(intervals):
+        if merged and s - merged[-1][1] <= max_gap_ms:
+            if e > merged[-1][1]:
+                merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def clip_intervals(intervals: Iterable[Interval], start_ms: int, end_ms: int) -> List[Interval]:
+    return [
+        (max(s, start_ms), min(e, end_ms))
+        for s, e in intervals
+        if e >= start_ms and s <= end_ms
+    ]
+
+
+def gaps_between(covered: Sequence[Interval], start_ms: int, end_ms: int) -> List[Interval]:
+    # covered 需已排序且已裁剪到 [start_ms, end_ms]
+    gaps: List[Interval] = []
+    cursor = start_ms
+    for s, e in covered:
+        if s > cursor:
+            gaps.append((cursor, s))
+        cursor = max(cursor, e)
+    if cursor < end_ms:
+        gaps.append((cursor, end_ms))
+    return gaps
@@ -25,12 +25,12 @@ class DatabasePool:
             self._pool = None
 
     @asynccontextmanager
-    async def transaction(self):
+    async def transaction(self, force_rollback: bool = False):
         if self._pool is None:
             await self.connect()
         assert self._pool is not None
         async with self._pool.connection() as conn:
-            async with conn.transaction():
+            async with conn.transaction(force_rollback=force_rollback):
                 yield conn
 
 
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from .config import settings
+from .repository import get_catalog_entry, insert_min1, query_values
+
+
+class DerivedParameter(NamedTuple):
+    inputs: Tuple[str, ...]
+    compute: Callable[..., np.ndarray]
+    unit: str
+    description: str
+
+
+def _magnitude(*components: np.ndarray) -> np.ndarray:
+    return np.sqrt(sum(c * c for c in components))
+
+
+def _clock_angle(by: np.ndarray, bz: np.ndarray) -> np.ndarray:
+    # IMF 时钟角：atan2(By, Bz)，取值 [0, 360)
+    return np.mod(np.degrees(np.arctan2(by, bz)), 360.0)
+
+
+def _dynamic_pressure(n: np.ndarray, v: np.ndarray) -> np.ndarray:
+    # Pdyn[nPa] = m_p * n[cm^-3] * V[km/s]^2 * 1e-6
+    return 1.6726e-6 * n * v * v
+
+
+DERIVED: Dict[str, DerivedParameter] = {
+    "B_mag": DerivedParameter(("BGSEc_0", "BGSEc_1", "BGSEc_2"), _magnitude, "nT", "IMF 磁场强度 |B|"),
+    "IMF_clock_angle": DerivedParameter(("BGSEc_1", "BGSEc_2"), _clock_angle, "deg", "IMF 时钟角"),
+    "Pdyn": DerivedParameter(("Np", "Vsw"), _dynamic_pressure, "nPa", "太阳风动压"),
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def is_materialized(name: str) -> bool:
+    return name in settings.derived_materialize
+
+
+def compute_derived(
+    name: str,
+    columns: Dict[str, Tuple[np.ndarray, np.ndarray]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """按时间戳取各输入序列的交集后向量化计算。columns: 参数名 -> (时间[us], 值)。"""
+    spec = DERIVED[name]
+    if any(p not in columns for p in spec.inputs):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    times = columns[spec.inputs[0]][0]
+    for p in spec.inputs[1:]:
+        times = np.intersect1d(times, columns[p][0], assume_unique=True)
+    args = []
+    for p in spec.inputs:
+        t, v = columns[p]
+        args.append(v[np.searchsorted(t, times)])
+    values = spec.compute(*args)
+    ok = np.isfinite(values)
+    return times[ok], values[ok]
+
+
+async def query_derived(
+    source: str,
+    name: str,
+    start: datetime,
+    end: datetime,
+    series: str,
+) -> List[Tuple[datetime, float]]:
+    columns = await query_values(source, DERIVED[name].inputs, start, end, series)
+    times, values = compute_derived(name, columns)
+    return [(_EPOCH + timedelta(microseconds=t), v) for t, v in zip(times.tolist(), values.tolist())]
+
+
+async def materialize_derived(touched: Dict[Tuple[str, str], Tuple[datetime, datetime]]) -> int:
+    """写入后重新计算受影响的物化衍生参数，并写入 min1 表。
+
+    touched: (source, 输入参数) -> 本次写入的 min1 时间范围
+    """
+    targets: Dict[Tuple[str, str], Tuple[datetime, datetime]] = {}
+    for (src, prm), (lo, hi) in touched.items():
+        for name in settings.derived_materialize:
+            spec = DERIVED.get(name)
+            if spec is None or prm not in spec.inputs:
+                continue
+            cur = targets.get((src, name))
+            targets[(src, name)] = (min(lo, cur[0]), max(hi, cur[1])) if cur else (lo, hi)
+    written = 0
+    for (src, name), (lo, hi) in targets.items():
+        # 数据源自带同名序列（有 raw 行）时不覆盖其 min1
+        entry = await get_catalog_entry(src, name)
+        if entry is not None and entry["raw_rows"] > 0:
+            continue
+        pts = await query_derived(src, name, lo, hi, "min1")
+        counts = await insert_min1([(t, src, name, v, None) for t, v in pts])
+        written += counts.written
+    return written
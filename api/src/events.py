@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import operator
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+OPS: Dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class RunDetector:
+    """分块扫描阈值事件：满足条件的连续样本（相邻间隔不超过 max_gap_ms）构成一个区间。
+
+    每块数据用 numpy 向量化计算游程，跨块的未结束区间由 ``_open`` 延续。
+    """
+
+    def __init__(self, op: str, threshold: float, max_gap_ms: int, min_duration_ms: int) -> None:
+        self._cond = OPS[op]
+        self._threshold = threshold
+        self._max_gap_ms = max_gap_ms
+        self._min_duration_ms = min_duration_ms
+        self._open: Optional[dict] = None
+        self._last_t: Optional[int] = None
+        self._last_hit = False
+
+    def _keep(self, run: dict) -> bool:
+        return run["end_ms"] - run["start_ms"] >= self._min_duration_ms
+
+    def feed(self, t_ms: np.ndarray, values: np.ndarray) -> List[dict]:
+        if t_ms.size == 0:
+            return []
+        hit = self._cond(values, self._threshold)
+        prev_hit = np.concatenate(([self._last_hit], hit[:-1]))
+        prev_t = np.concatenate(([self._last_t if self._last_t is not None else t_ms[0]], t_ms[:-1]))
+        starts = hit & (~prev_hit | (t_ms - prev_t > self._max_gap_ms))
+        self._last_t = int(t_ms[-1])
+        self._last_hit = bool(hit[-1])
+
+        idx = np.flatnonzero(hit)
+        closed: List[dict] = []
+        if idx.size == 0:
+            if self._open is not None:
+                closed.append(self._open)
+                self._open = None
+            return [r for r in closed if self._keep(r)]
+
+        seg = np.flatnonzero(starts[idx])
+        continues = seg.size == 0 or seg[0] != 0
+        if continues:
+            seg = np.concatenate(([0], seg))
+        v = values[idx]
+        t = t_ms[idx]
+        ends = np.concatenate((seg[1:], [idx.size])) - 1
+        runs = [
+            {"start_ms": int(a), "end_ms": int(b), "count": int(n), "sum": float(s), "min": float(lo), "max": float(hi)}
+            for a, b, n, s, lo, hi in zip(
+                t[seg].tolist(),
+                t[ends].tolist(),
+                (ends - seg + 1).tolist(),
+                np.add.reduceat(v, seg).tolist(),
+                np.minimum.reduceat(v, seg).tolist(),
+                np.maximum.reduceat(v, seg).tolist(),
+            )
+        ]
+        if continues and self._open is not None:
+            first, cur = runs[0], self._open
+            runs[0] = {
+                "start_ms": cur["start_ms"],
+                "end_ms": first["end_ms"],
+                "count": cur["count"] + first["count"],
+                "sum": cur["sum"] + first["sum"],
+                "min": min(cur["min"], first["min"]),
+                "max": max(cur["max"], first["max"]),
+            }
+        elif self._open is not None:
+            closed.append(self._open)
+        self._open = runs.pop() if hit[-1] else None
+        closed.extend(runs)
+        return [r for r in closed if self._keep(r)]
+
+    def finish(self) -> List[dict]:
+        run, self._open = self._open, None
+        return [run] if run is not None and self._keep(run) else []
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import hashlib
+from typing import Iterable, Tuple
+
+import numpy as np
+import orjson
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+
+
+def _to_us(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // _US
+
+
+def batch_content_hash(rows: Iterable[Tuple]) -> str:
+    # rows: (time, source, parameter, value, quality)
+    # 数值按 IEEE 754 原始字节参与哈希：orjson 会把 NaN/±Inf 都写成 null
+    rows = list(rows)
+    t_us = np.fromiter((_to_us(r[0]) for r in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r[3] for r in rows), dtype=float, count=len(rows))
+    h = hashlib.sha256()
+    h.update(t_us.tobytes())
+    h.update(values.tobytes())
+    h.update(orjson.dumps([(r[1], r[2], r[4]) for r in rows]))
+    return h.hexdigest()
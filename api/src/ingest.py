@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from datetime import datetime
+import math
+import random
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+from .config import settings
+from .coverage import Interval, intervals_from_times, merge_intervals, to_ms
+from .derived import materialize_derived
+from .idempotency import batch_content_hash
+from .interpolation import is_regular_1min_series, linear_interpolate_to_minute
+from .live import live_hub
+from .models import IngestResponse, MeasurementIn
+from .repository import (
+    IngestRecord,
+    UpsertCounts,
+    expire_ingest_batches,
+    find_ingest_batches,
+    write_ingest,
+)
+
+
+class PreparedBatch(NamedTuple):
+    source: str
+    parameter: str
+    raw_rows: List[tuple]
+    min1_rows: List[tuple]
+    intervals: List[Interval]
+    batch_key: str
+    content_hash: str
+
+
+def prepare_batch(measurements: List[MeasurementIn], idempotency_key: Optional[str]) -> PreparedBatch:
+    # Validate single source/parameter batch to simplify pipeline
+    src = {m.source for m in measurements}
+    prm = {m.parameter for m in measurements}
+    if len(src) != 1 or len(prm) != 1:
+        raise HTTPException(status_code=400, detail="每次上传应为同一 source 与 parameter 的批次")
+
+    source = next(iter(src))
+    parameter = next(iter(prm))
+
+    tuples = [(m.time, m.source, m.parameter, m.value, m.quality) for m in measurements]
+
+    # 未提供 Idempotency-Key 时以内容哈希作为键
+    content_hash = batch_content_hash(tuples)
+    batch_key = idempotency_key or content_hash
+
+    times = [m.time for m in measurements]
+    intervals = intervals_from_times([to_ms(t) for t in times], settings.coverage_max_gap_ms)
+
+    # 生成/复制 1 分钟序列（如存在 NaN/Inf，则用线性插值填充，确保无 NaN）
+    start, end = min(times), max(times)
+    pts = [(m.time, m.value) for m in measurements]
+    all_finite = all(math.isfinite(v) for _, v in pts)
+    if is_regular_1min_series(pts) and all_finite:
+        tuples_min1 = [(t, source, parameter, v, None) for t, v in pts]
+    else:
+        interp = linear_interpolate_to_minute(pts, start, end)
+        tuples_min1 = [(t, source, parameter, v, None) for t, v in interp]
+
+    return PreparedBatch(source, parameter, tuples, tuples_min1, intervals, batch_key, content_hash)
+
+
+# 过期批次记录的清理不在每次写入时执行，约每 1/_EXPIRE_PROBABILITY 次写入清理一次
+_EXPIRE_PROBABILITY = 0.01
+
+
+def _responses(todo: List[PreparedBatch], raw: UpsertCounts, min1: UpsertCounts) -> List[IngestResponse]:
+    if len(todo) == 1:
+        return [
+            IngestResponse(
+                stored_raw=raw.written,
+                stored_min1=min1.written,
+                inserted_raw=raw.inserted,
+                updated_raw=raw.updated,
+                unchanged_raw=raw.unchanged,
+                inserted_min1=min1.inserted,
+                updated_min1=min1.updated,
+                unchanged_min1=min1.unchanged,
+            )
+        ]
+    return [IngestResponse(stored_raw=len(b.raw_rows), stored_min1=len(b.min1_rows)) for b in todo]
+
+
+async def apply_batches(batches: List[PreparedBatch]) -> List[Union[IngestResponse, HTTPException]]:
+    """写入一组批次（一个事务），按输入顺序返回每个批次的响应或错误。
+
+    已写入过的批次直接返回首次结果（replayed）；只有一个新批次时可给出
+    inserted/updated/unchanged 明细，多个批次合并写入时 stored_* 为接收行数。
+    """
+    retention_h = settings.ingest_dedup_retention_h
+    prev = await find_ingest_batches(list({b.batch_key for b in batches}), retention_h)
+
+    results: List[Union[IngestResponse, HTTPException, None]] = [None] * len(batches)
+    fresh: Dict[str, int] = {}
+    for i, b in enumerate(batches):
+        seen = prev.get(b.batch_key)
+        if seen is None and b.batch_key in fresh:
+            seen = {"content_hash": batches[fresh[b.batch_key]].content_hash, "response": None}
+        if seen is None:
+            fresh[b.batch_key] = i
+        elif seen["content_hash"] != b.content_hash:
+            results[i] = HTTPException(status_code=409, detail="Idempotency-Key 已用于内容不同的批次")
+        elif seen["response"] is not None:
+            results[i] = IngestResponse(**{**seen["response"], "replayed": True})
+
+    todo = [batches[i] for i in fresh.values()]
+    if todo:
+        coverage: Dict[Tuple[str, str], List[Interval]] = {}
+        for b in todo:
+            coverage.setdefault((b.source, b.parameter), []).extend(b.intervals)
+        max_gap_ms = settings.coverage_max_gap_ms
+        coverage = {k: merge_intervals(v, max_gap_ms) for k, v in coverage.items()}
+        raw_rows = [r for b in todo for r in b.raw_rows]
+        min1_rows = [r for b in todo for r in b.min1_rows]
+        responses: List[IngestResponse] = []
+
+        def record(raw: UpsertCounts, min1: UpsertCounts) -> List[IngestRecord]:
+            responses[:] = _responses(todo, raw, min1)
+            return [
+                (b.batch_key, b.content_hash, b.source, b.parameter, len(b.raw_rows), r.model_dump())
+                for b, r in zip(todo, responses)
+            ]
+
+        await write_ingest(raw_rows, min1_rows, coverage, max_gap_ms, record)
+        for i, resp in zip(fresh.values(), responses):
+            results[i] = resp
+        live_hub.publish("raw", raw_rows)
+        live_hub.publish("min1", min1_rows)
+        if settings.derived_materialize:
+            touched: Dict[Tuple[str, str], Tuple[datetime, datetime]] = {}
+            for b in todo:
+                if b.min1_rows:
+                    lo = min(r[0] for r in b.min1_rows)
+                    hi = max(r[0] for r in b.min1_rows)
+                    cur = touched.get((b.source, b.parameter))
+                    touched[(b.source, b.parameter)] = (min(lo, cur[0]), max(hi, cur[1])) if cur else (lo, hi)
+            await materialize_derived(touched)
+        if random.random() < _EXPIRE_PROBABILITY:
+            await expire_ingest_batches(retention_h)
+
+    # 同一次写入中重复出现的批次，返回首个批次的结果
+    for i, b in enumerate(batches):
+        if results[i] is None:
+            first = results[fresh[b.batch_key]]
+            results[i] = first.model_copy(update={"replayed": True})  # type: ignore[union-attr]
+    return results  # type: ignore[return-value]
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, Iterable, List, Set, Tuple
+
+import orjson
+
+from .config import settings
+from .coverage import to_ms
+
+
+class Subscriber:
+    def __init__(self, keys: Set[Tuple[str, str]], tiers: Set[str], maxsize: int) -> None:
+        self.keys = keys
+        self.tiers = tiers
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, msg: bytes) -> None:
+        # 慢消费者：丢弃最旧的消息，绝不阻塞写入路径
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(msg)
+
+
+class LiveHub:
+    """进程内的实时数据分发：写入路径提交后发布，按 (source, parameter) 扇出给订阅者。"""
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._subs: Dict[Tuple[str, str], Set[Subscriber]] = {}
+
+    def subscribe(self, keys: Iterable[Tuple[str, str]], tiers: Iterable[str]) -> Subscriber:
+        sub = Subscriber(set(keys), set(tiers), self.queue_size)
+        for key in sub.keys:
+            self._subs.setdefault(key, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        for key in sub.keys:
+            subs = self._subs.get(key)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[key]
+
+    def publish(self, tier: str, rows: List[tuple]) -> None:
+        if not self._subs or not rows:
+            return
+        grouped: Dict[Tuple[str, str], List[list]] = {}
+        for t, src, prm, v, _ in rows:
+            if (src, prm) in self._subs:
+                grouped.setdefault((src, prm), []).append([to_ms(t), v])
+        for (src, prm), points in grouped.items():
+            targets = [s for s in self._subs.get((src, prm), ()) if tier in s.tiers]
+            if not targets:
+                continue
+            # 每个序列只序列化一次，所有订阅者共享同一份消息
+            msg = orjson.dumps(
+                {"type": "data", "tier": tier, "source": src, "parameter": prm, "points": points}
+            )
+            for sub in targets:
+                sub.offer(msg)
+
+
+live_hub = LiveHub(queue_size=settings.live_queue_size)
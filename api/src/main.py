@@ -5,19 +5,27 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
+from .buffer import ingest_buffer
+from .config import settings
 from .db import db_pool
+from .profiling import ProfilingMiddleware
 from .routers import router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db_pool.connect()
+    if settings.ingest_buffer_enabled:
+        await ingest_buffer.start()
     yield
+    # 先把缓冲中的数据写完再关闭连接池
+    await ingest_buffer.stop()
     await db_pool.close()
 
 
 app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan, title="SWL Remote DB")
 
+app.add_middleware(ProfilingMiddleware)
 app.include_router(router, prefix="/v1")
 
 
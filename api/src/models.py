@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -15,6 +15,14 @@ class MeasurementIn(BaseModel):
 class IngestResponse(BaseModel):
     stored_raw: int
     stored_min1: int
+    inserted_raw: int = 0
+    updated_raw: int = 0
+    unchanged_raw: int = 0
+    inserted_min1: int = 0
+    updated_min1: int = 0
+    unchanged_min1: int = 0
+    replayed: bool = Field(default=False, description="命中幂等键，未重复写入")
+    buffered: bool = Field(default=False, description="经写入缓冲合并写入")
 
 
 class QueryRequest(BaseModel):
@@ -33,3 +41,107 @@ class MeasurementOut(BaseModel):
     quality: Optional[int] = None
 
 
+
+
+class CoverageRequest(BaseModel):
+    source: str
+    parameter: str
+    start: datetime = Field(description="ISO-8601 或 Unix 毫秒")
+    end: datetime = Field(description="ISO-8601 或 Unix 毫秒")
+
+
+class CoverageResponse(BaseModel):
+    source: str
+    parameter: str
+    start_ms: int
+    end_ms: int
+    max_gap_ms: int
+    covered: List[Tuple[int, int]]
+    gaps: List[Tuple[int, int]]
+
+
+class SeriesInfo(BaseModel):
+    source: str
+    parameter: str
+    first_time: datetime
+    last_time: datetime
+    raw_rows: int
+    min1_rows: int
+    value_min: Optional[float] = None
+    value_max: Optional[float] = None
+    last_ingest_at: datetime
+
+
+class DerivedInfo(BaseModel):
+    name: str
+    inputs: List[str]
+    unit: str
+    description: str
+    materialized: bool
+
+
+class StatsRequest(BaseModel):
+    source: str
+    parameter: str
+    start: datetime
+    end: datetime
+    series: Literal["raw", "min1"] = "raw"
+    percentiles: List[float] = Field(
+        default=[0.05, 0.25, 0.5, 0.75, 0.95], description="分位点，取值 [0, 1]"
+    )
+    bins: int = Field(default=0, ge=0, le=10000, description="直方图分箱数，0 表示不计算")
+    hist_min: Optional[float] = Field(default=None, description="直方图下界，默认取最小值")
+    hist_max: Optional[float] = Field(default=None, description="直方图上界，默认取最大值")
+    approximate: bool = Field(default=False, description="近似分位数（需 timescaledb_toolkit）")
+
+
+class Histogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+    below: int
+    above: int
+
+
+class StatsResponse(BaseModel):
+    source: str
+    parameter: str
+    series: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+    histogram: Optional[Histogram] = None
+
+
+class EventsRequest(BaseModel):
+    source: str
+    parameter: str
+    start: datetime
+    end: datetime
+    series: Literal["raw", "min1"] = "min1"
+    op: Literal["<", "<=", ">", ">="] = Field(description="比较运算，如 Bz < -10 使用 \"<\"")
+    threshold: float
+    min_duration_s: float = Field(default=0.0, ge=0, description="事件最短持续时间（秒）")
+    max_gap_s: float = Field(default=120.0, ge=0, description="相邻满足条件样本允许的最大间隔（秒）")
+    max_events: int = Field(default=10000, ge=1, le=100000)
+
+
+class EventOut(BaseModel):
+    start: datetime
+    end: datetime
+    duration_s: float
+    count: int
+    mean: float
+    min: float
+    max: float
+
+
+class EventsResponse(BaseModel):
+    source: str
+    parameter: str
+    series: str
+    condition: str
+    events: List[EventOut]
+    truncated: bool = False
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+import orjson
+
+from .config import settings
+from .coverage import Interval, to_ms
+from .repository import query_coverage, query_series
+
+
+# 与 sql/init.sql 中各 hypertable 的 chunk_time_interval 保持一致
+CHUNK_INTERVALS = {"raw": timedelta(days=7), "min1": timedelta(days=30)}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+
+Range = Tuple[datetime, datetime]
+
+
+def split_range(start: datetime, end: datetime, interval: timedelta) -> List[Range]:
+    """按 chunk 边界（自 Unix epoch 起按 interval 对齐）切分 [start, end]。
+
+    子区间为互不重叠的闭区间，时间精度为微秒，与 timestamptz 一致。
+    end 恰好落在边界上时不单独切出零长度的末段。
+    """
+    parts: List[Range] = []
+    lo = start
+    boundary = _EPOCH + ((start - _EPOCH) // interval + 1) * interval
+    while boundary < end:
+        parts.append((lo, boundary - _US))
+        lo = boundary
+        boundary += interval
+    parts.append((lo, end))
+    return parts
+
+
+def _utc(ts: datetime) -> datetime:
+    # 未带时区的时间按 UTC 处理，与 coverage.to_ms 一致
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def _overlaps(part: Range, covered: List[Interval]) -> bool:
+    lo, hi = to_ms(part[0]), to_ms(part[1])
+    return any(s <= hi and e >= lo for s, e in covered)
+
+
+async def plan_query(
+    source: str,
+    parameter: str,
+    start: datetime,
+    end: datetime,
+    series: str,
+) -> List[Range]:
+    interval = CHUNK_INTERVALS[series]
+    start, end = _utc(start), _utc(end)
+    # 不足 QUERY_SPLIT_MIN_CHUNKS 个 chunk 长度的区间单次扫描即可，并发子查询得不偿失
+    if end - start < settings.query_split_min_chunks * interval:
+        return [(start, end)]
+    parts = split_range(start, end, interval)
+    # 覆盖索引来自 raw 采样时间，而 min1 会跨 raw 缺口插值，因此只裁剪 raw
+    if series != "raw" or not settings.query_skip_uncovered:
+        return parts
+    covered = await query_coverage(source, parameter, start, end)
+    if not covered:
+        # 覆盖索引为空时无法区分"无数据"与"尚未建立索引"，不做裁剪
+        return parts
+    return [p for p in parts if _overlaps(p, covered)]
+
+
+async def stream_series(
+    source: str,
+    parameter: str,
+    parts: List[Range],
+    series: str,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """并发执行各子区间查询（同时最多 concurrency 个），按时间顺序流式输出 JSON 数组。"""
+    limit = max(1, concurrency or settings.query_max_concurrency)
+    todo = iter(parts)
+    pending: Deque[asyncio.Task] = deque()
+
+    def launch() -> None:
+        part = next(todo, None)
+        if part is not None:
+            pending.append(asyncio.create_task(query_series(source, parameter, part[0], part[1], series)))
+
+    for _ in range(limit):
+        launch()
+    first = True
+    try:
+        yield b"["
+        while pending:
+            rows = await pending.popleft()
+            launch()
+            if not rows:
+                continue
+            if not first:
+                yield b","
+            yield orjson.dumps(rows, option=orjson.OPT_UTC_Z)[1:-1]
+            first = False
+        yield b"]"
+    finally:
+        for task in pending:
+            task.cancel()
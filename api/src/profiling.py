@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hmac
+import io
+import logging
+import pstats
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .db import db_pool
+
+
+logger = logging.getLogger("swl.slow")
+
+_MAX_SQL = 50
+
+
+class RequestProfile:
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+        self.sql: List[Tuple[str, Any]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("swl_request_profile", default=None)
+# cProfile 同一线程只能有一个在运行
+_python_profile_busy = False
+
+
+@contextmanager
+def phase(name: str):
+    prof = _current.get()
+    if prof is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        prof.add(name, time.perf_counter() - t0)
+
+
+def mark(name: str) -> None:
+    prof = _current.get()
+    if prof is not None:
+        prof.marks[name] = time.perf_counter()
+
+
+def record_sql(query: str, params: Any) -> None:
+    prof = _current.get()
+    if prof is not None and len(prof.sql) < _MAX_SQL:
+        prof.sql.append((query, params))
+
+
+async def explain(query: str, params: Any, analyze: bool = True) -> Any:
+    # 写语句同样会被真实执行，因此放在强制回滚的事务中
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    async with db_pool.transaction(force_rollback=True) as conn:
+        cur = await conn.execute(f"EXPLAIN ({options}) " + query, params)
+        row = await cur.fetchone()
+    return row["QUERY PLAN"] if row else None
+
+
+async def _explain_all(
+    sql: List[Tuple[str, Any]], selects_only: bool, analyze: bool = True
+) -> List[Dict[str, Any]]:
+    out = []
+    for query, params in sql:
+        if selects_only and not query.lstrip().upper().startswith("SELECT"):
+            continue
+        try:
+            plan = await explain(query, params, analyze)
+        except Exception as exc:
+            plan = f"EXPLAIN failed: {exc}"
+        out.append({"query": query, "params": params, "plan": plan})
+    return out
+
+
+def _summary(prof: RequestProfile, scope: Scope, status: int, total_s: float, t_returned: float) -> Dict[str, Any]:
+    phases = {k: round(v * 1000, 3) for k, v in prof.phases.items()}
+    if "returned" in prof.marks:
+        # 路由函数返回后到响应开始发送：FastAPI 响应模型校验 + ORJSON 序列化
+        phases["serialize"] = round((t_returned - prof.marks["returned"]) * 1000, 3)
+    return {
+        "method": scope["method"],
+        "path": scope["path"],
+        "status_code": status,
+        "total_ms": round(total_s * 1000, 3),
+        "phases_ms": phases,
+    }
+
+
+# 慢请求日志只做不执行语句的 EXPLAIN，且串行进行，避免在系统繁忙时再占用连接池
+_slow_log_lock = asyncio.Semaphore(1)
+_slow_log_tasks: Set[asyncio.Task] = set()
+
+
+async def _log_slow(summary: Dict[str, Any], sql: List[Tuple[str, Any]]) -> None:
+    async with _slow_log_lock:
+        try:
+            summary["sql"] = await _explain_all(sql, selects_only=True, analyze=False)
+        except Exception:
+            summary["sql"] = [{"query": q, "params": p} for q, p in sql]
+    logger.warning("slow request: %s", orjson.dumps(summary, default=str).decode())
+
+
+def _authorized(token: Optional[str]) -> bool:
+    return bool(settings.admin_token) and hmac.compare_digest(
+        (token or "").encode(), settings.admin_token.encode()
+    )
+
+
+class ProfilingMiddleware:
+    """纯 ASGI 中间件：记录分阶段耗时；慢请求写日志；管理员可请求 profiling 报告。"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        wanted = (
+            headers.get("X-Profile") == "1"
+            or QueryParams(scope.get("query_string", b"")).get("profile") == "1"
+        )
+        if wanted:
+            if not _authorized(headers.get("X-Admin-Token")):
+                await ORJSONResponse({"detail": "profiling 需要管理员令牌"}, status_code=403)(scope, receive, send)
+                return
+            await self._profile(scope, receive, send)
+            return
+
+        prof = RequestProfile()
+        token = _current.set(prof)
+        started: Dict[str, Any] = {}
+        t0 = time.perf_counter()
+
+        async def send_watched(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                started["status"] = message["status"]
+                started["at"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_watched)
+        finally:
+            _current.reset(token)
+        total_s = time.perf_counter() - t0
+        if settings.slow_request_ms > 0 and total_s * 1000 >= settings.slow_request_ms:
+            summary = _summary(prof, scope, started.get("status", 0), total_s, started.get("at", t0))
+            task = asyncio.create_task(_log_slow(summary, list(prof.sql)))
+            _slow_log_tasks.add(task)
+            task.add_done_callback(_slow_log_tasks.discard)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _python_profile_busy
+
+        prof = RequestProfile()
+        token = _current.set(prof)
+        profiler: Optional[cProfile.Profile] = None
+        if not _python_profile_busy:
+            _python_profile_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started: Dict[str, Any] = {}
+        size = 0
+
+        async def send_captured(message: Message) -> None:
+            # 读完响应体（流式响应的查询也在此期间执行），但不发给客户端
+            nonlocal size
+            if message["type"] == "http.response.start":
+                started["status"] = message["status"]
+                started["at"] = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_captured)
+            total_s = time.perf_counter() - t0
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _python_profile_busy = False
+            _current.reset(token)
+
+        report = _summary(prof, scope, started.get("status", 0), total_s, started.get("at", t0))
+        report["response_bytes"] = size
+        report["sql"] = await _explain_all(prof.sql, selects_only=False)
+        if profiler is not None:
+            buf = io.StringIO()
+            pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(40)
+            report["python_profile"] = buf.getvalue()
+        else:
+            report["python_profile"] = None
+        await ORJSONResponse(report, headers={"X-Profiled": "1"})(scope, receive, send)
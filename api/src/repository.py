@@ -1,63 +1,542 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Iterable, List, Tuple
+from datetime import date, datetime, timezone
+import math
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
+import numpy as np
+from psycopg.rows import tuple_row
+from psycopg.types.json import Jsonb
+
+from .config import settings
+from .coverage import Interval, from_ms, merge_intervals, to_ms
 from .db import db_pool
+from .profiling import phase, record_sql
 
 
-async def insert_raw(
-    rows: Iterable[Tuple[datetime, str, str, float, int | None]]
-) -> int:
-    q = (
-        "INSERT INTO swl.raw_measurements (time, source, parameter, value, quality)\n"
+class UpsertCounts(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+
+def _upsert_sql(table: str) -> str:
+    # 值未变化的行不做 UPDATE（不产生 WAL/死元组），也不会出现在 RETURNING 中；
+    # RETURNING (xmax = 0) 区分新插入与更新
+    return (
+        f"INSERT INTO {table} AS t (time, source, parameter, value, quality)\n"
         "VALUES (%s, %s, %s, %s, %s)\n"
         "ON CONFLICT (time, source, parameter) DO UPDATE SET\n"
-        "  value = EXCLUDED.value, quality = EXCLUDED.quality"
+        "  value = EXCLUDED.value, quality = EXCLUDED.quality\n"
+        "WHERE (t.value, t.quality) IS DISTINCT FROM (EXCLUDED.value, EXCLUDED.quality)\n"
+        "RETURNING source, parameter, (xmax = 0) AS inserted"
     )
+
+
+async def _upsert_measurements(
+    cur, table: str, rows_list: List[tuple]
+) -> Tuple[Dict[Tuple[str, str], int], UpsertCounts]:
+    q = _upsert_sql(table)
+    record_sql(q, rows_list[0])
+    with phase("db"):
+        await cur.executemany(q, rows_list, returning=True)  # type: ignore[arg-type]
+    inserted: Dict[Tuple[str, str], int] = {}
+    n_inserted = n_updated = 0
+    while True:
+        for r in await cur.fetchall():
+            key = (r["source"], r["parameter"])
+            inserted[key] = inserted.get(key, 0) + int(r["inserted"])
+            if r["inserted"]:
+                n_inserted += 1
+            else:
+                n_updated += 1
+        if not cur.nextset():
+            break
+    unchanged = len(rows_list) - n_inserted - n_updated
+    return inserted, UpsertCounts(n_inserted, n_updated, unchanged)
+
+
+_MINUTES_PER_DAY = 1440
+
+
+def _min1_daily() -> bool:
+    return settings.min1_storage == "daily"
+
+
+async def _merge_min1_daily(
+    cur, rows_list: List[tuple]
+) -> Tuple[Dict[Tuple[str, str], int], UpsertCounts]:
+    # 按 (序列, UTC 日) 组装 1440 长度的数组，缺失分钟为 NULL
+    days: Dict[Tuple[str, str, date], Tuple[np.ndarray, np.ndarray]] = {}
+    for t, src, prm, v, _ in rows_list:
+        t = t.astimezone(timezone.utc)
+        slot = days.get((src, prm, t.date()))
+        if slot is None:
+            slot = days[(src, prm, t.date())] = (
+                np.zeros(_MINUTES_PER_DAY),
+                np.zeros(_MINUTES_PER_DAY, dtype=bool),
+            )
+        i = t.hour * 60 + t.minute
+        slot[0][i] = v
+        slot[1][i] = True
+    keys = sorted(days)
+    # FOR UPDATE 锁不住尚不存在的日行：按序列加事务级 advisory 锁（固定顺序）使同一序列的
+    # 合并串行执行，再逐分钟比较得到新增/更新/未变化计数，并发创建同一日行时不会重复计数
+    params = ([k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys])
+    with phase("db"):
+        for src, prm in sorted({(k[0], k[1]) for k in keys}):
+            await cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"min1_daily/{src}/{prm}",))
+    q = (
+        "SELECT source, parameter, day, vals FROM swl.min1_daily\n"
+        "WHERE (source, parameter, day) IN (SELECT * FROM unnest(%s::text[], %s::text[], %s::date[]))"
+    )
+    record_sql(q, params)
+    with phase("db"):
+        await cur.execute(q, params)
+        existing = {(r["source"], r["parameter"], r["day"]): r["vals"] for r in await cur.fetchall()}
+    inserted: Dict[Tuple[str, str], int] = {}
+    n_inserted = n_updated = 0
+    changed = []
+    for key in keys:
+        new_vals, new_valid = days[key]
+        old = existing.get(key)
+        if old is None:
+            old_valid = np.zeros(_MINUTES_PER_DAY, dtype=bool)
+            old_vals = np.zeros(_MINUTES_PER_DAY)
+        else:
+            old_valid = np.array([x is not None for x in old])
+            old_vals = np.array([np.nan if x is None else x for x in old], dtype=float)
+        added = int(np.count_nonzero(new_valid & ~old_valid))
+        # 与 IS DISTINCT FROM 一致：NaN 与 NaN 视为相同
+        same = (old_vals == new_vals) | (np.isnan(old_vals) & np.isnan(new_vals))
+        updated = int(np.count_nonzero(new_valid & old_valid & ~same))
+        if added or updated:
+            series = (key[0], key[1])
+            inserted[series] = inserted.get(series, 0) + added
+            n_inserted += added
+            n_updated += updated
+            vals = [float(x) if ok else None for x, ok in zip(new_vals.tolist(), new_valid.tolist())]
+            changed.append((key[0], key[1], key[2], vals))
+    if changed:
+        # 数组合并在 SQL 中完成，与已有元素逐分钟 COALESCE
+        q = (
+            "INSERT INTO swl.min1_daily AS d (source, parameter, day, vals)\n"
+            "VALUES (%s, %s, %s, %s::float8[])\n"
+            "ON CONFLICT (source, parameter, day) DO UPDATE SET\n"
+            "  vals = ARRAY(SELECT COALESCE(EXCLUDED.vals[i], d.vals[i])\n"
+            "               FROM generate_series(1, 1440) AS i ORDER BY i)"
+        )
+        record_sql(q, changed[0])
+        with phase("db"):
+            await cur.executemany(q, changed)
+    unchanged = len(rows_list) - n_inserted - n_updated
+    return inserted, UpsertCounts(n_inserted, n_updated, unchanged)
+
+
+async def _touch_catalog(
+    cur,
+    tier: str,
+    rows_list: List[tuple],
+    inserted: Dict[Tuple[str, str], int],
+) -> None:
+    stats: Dict[Tuple[str, str], list] = {}
+    for t, src, prm, v, _ in rows_list:
+        st = stats.get((src, prm))
+        if st is None:
+            st = stats[(src, prm)] = [t, t, None, None]
+        if t < st[0]:
+            st[0] = t
+        if t > st[1]:
+            st[1] = t
+        # 仅 raw 层记录取值范围，min1 为插值结果
+        if tier == "raw" and math.isfinite(v):
+            st[2] = v if st[2] is None else min(st[2], v)
+            st[3] = v if st[3] is None else max(st[3], v)
+    q = (
+        "INSERT INTO swl.series_catalog AS c\n"
+        "  (source, parameter, first_time, last_time, raw_rows, min1_rows, value_min, value_max, last_ingest_at)\n"
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())\n"
+        "ON CONFLICT (source, parameter) DO UPDATE SET\n"
+        "  first_time = LEAST(c.first_time, EXCLUDED.first_time),\n"
+        "  last_time = GREATEST(c.last_time, EXCLUDED.last_time),\n"
+        "  raw_rows = c.raw_rows + EXCLUDED.raw_rows,\n"
+        "  min1_rows = c.min1_rows + EXCLUDED.min1_rows,\n"
+        "  value_min = LEAST(c.value_min, EXCLUDED.value_min),\n"
+        "  value_max = GREATEST(c.value_max, EXCLUDED.value_max),\n"
+        "  last_ingest_at = now()"
+    )
+    params = []
+    # 固定加锁顺序，避免多序列并发写入时死锁
+    for (src, prm), (first, last, vmin, vmax) in sorted(stats.items()):
+        n = inserted.get((src, prm), 0)
+        raw_n, min1_n = (n, 0) if tier == "raw" else (0, n)
+        params.append((src, prm, first, last, raw_n, min1_n, vmin, vmax))
+    await cur.executemany(q, params)
+
+
+async def _write_measurements(
+    cur, table: str, tier: str, rows_list: List[tuple]
+) -> Tuple[Dict[Tuple[str, str], int], UpsertCounts]:
+    if not rows_list:
+        return {}, UpsertCounts(0, 0, 0)
+    if tier == "min1" and _min1_daily():
+        inserted, counts = await _merge_min1_daily(cur, rows_list)
+    else:
+        inserted, counts = await _upsert_measurements(cur, table, rows_list)
+    # 完全重复的写入不再触碰目录行
+    if counts.written:
+        await _touch_catalog(cur, tier, rows_list, inserted)
+    return inserted, counts
+
+
+async def _insert_measurements(
+    table: str,
+    tier: str,
+    rows: Iterable[Tuple[datetime, str, str, float, int | None]],
+) -> UpsertCounts:
     rows_list = list(rows)
     if not rows_list:
-        return 0
+        return UpsertCounts(0, 0, 0)
     async with db_pool.transaction() as conn:
         async with conn.cursor() as cur:
-            await cur.executemany(q, rows_list)  # type: ignore[arg-type]
-    return len(rows_list)
+            _, counts = await _write_measurements(cur, table, tier, rows_list)
+    return counts
+
+
+async def insert_raw(
+    rows: Iterable[Tuple[datetime, str, str, float, int | None]]
+) -> UpsertCounts:
+    return await _insert_measurements("swl.raw_measurements", "raw", rows)
 
 
 async def insert_min1(
     rows: Iterable[Tuple[datetime, str, str, float, int | None]]
-) -> int:
+) -> UpsertCounts:
+    return await _insert_measurements("swl.min1_measurements", "min1", rows)
+
+
+# min1 按日数组存储时展开为与行表相同的列 (time, source, parameter, value, quality)；
+# 只读取与区间相交的日行，并按区间切片数组。切片边界在 OFFSET 0 子查询中按日计算一次，
+# 否则会被展开到每个数组元素上重复求值
+_MIN1_DAILY_ROWS = (
+    "(SELECT b.t0 + u.o * INTERVAL '1 minute' AS time, d.source, d.parameter,\n"
+    "        u.value, NULL::smallint AS quality\n"
+    "   FROM swl.min1_daily d\n"
+    "   CROSS JOIN LATERAL (\n"
+    "     SELECT t0 + (lo - 2) * INTERVAL '1 minute' AS t0, lo, hi\n"
+    "     FROM (SELECT t0,\n"
+    "                  GREATEST(1, CEIL(EXTRACT(EPOCH FROM %(start)s - t0) / 60)::int + 1) AS lo,\n"
+    "                  LEAST(1440, FLOOR(EXTRACT(EPOCH FROM %(end)s - t0) / 60)::int + 1) AS hi\n"
+    "           FROM (SELECT d.day::timestamp AT TIME ZONE 'UTC' AS t0) z) y\n"
+    "     OFFSET 0) b\n"
+    "   CROSS JOIN LATERAL unnest(d.vals[b.lo:b.hi]) WITH ORDINALITY AS u(value, o)\n"
+    "  WHERE d.source = %(source)s AND {parameter_clause}\n"
+    "    AND d.day BETWEEN (%(start)s AT TIME ZONE 'UTC')::date AND (%(end)s AT TIME ZONE 'UTC')::date\n"
+    "    AND u.value IS NOT NULL) m"
+)
+
+
+def _relation(series: str, parameter_clause: str = "parameter = %(parameter)s") -> str:
+    # 查询使用命名参数 source/parameter(s)/start/end
+    if series == "raw":
+        return "swl.raw_measurements"
+    if _min1_daily():
+        return _MIN1_DAILY_ROWS.format(parameter_clause="d." + parameter_clause)
+    return "swl.min1_measurements"
+
+
+async def query_series(
+    source: str,
+    parameter: str,
+    start: datetime,
+    end: datetime,
+    series: str,
+) -> List[tuple]:
     q = (
-        "INSERT INTO swl.min1_measurements (time, source, parameter, value, quality)\n"
-        "VALUES (%s, %s, %s, %s, %s)\n"
-        "ON CONFLICT (time, source, parameter) DO UPDATE SET\n"
-        "  value = EXCLUDED.value, quality = EXCLUDED.quality"
+        f"SELECT time, source, parameter, value, quality FROM {_relation(series)}\n"
+        "WHERE source = %(source)s AND parameter = %(parameter)s AND time >= %(start)s AND time <= %(end)s\n"
+        "ORDER BY time ASC"
     )
-    rows_list = list(rows)
-    if not rows_list:
-        return 0
+    params = {"source": source, "parameter": parameter, "start": start, "end": end}
     async with db_pool.transaction() as conn:
-        async with conn.cursor() as cur:
-            await cur.executemany(q, rows_list)  # type: ignore[arg-type]
-    return len(rows_list)
+        record_sql(q, params)
+        with phase("db"):
+            cur = await conn.execute(q, params)
+            rows = await cur.fetchall()
+    return rows
 
 
-async def query_series(
+async def query_values(
+    source: str,
+    parameters: Iterable[str],
+    start: datetime,
+    end: datetime,
+    series: str,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    # 一次查询取回多个参数，返回 参数名 -> (时间[Unix 微秒], 值) 的列式数组
+    q = (
+        "SELECT parameter, (EXTRACT(EPOCH FROM time) * 1000000)::int8 AS t_us, value\n"
+        f"FROM {_relation(series, 'parameter = ANY(%(parameters)s)')}\n"
+        "WHERE source = %(source)s AND parameter = ANY(%(parameters)s) AND time >= %(start)s AND time <= %(end)s\n"
+        "ORDER BY parameter, time ASC"
+    )
+    params = {"source": source, "parameters": list(parameters), "start": start, "end": end}
+    async with db_pool.transaction() as conn:
+        async with conn.cursor(row_factory=tuple_row) as cur:
+            record_sql(q, params)
+            with phase("db"):
+                await cur.execute(q, params)
+                rows = await cur.fetchall()
+    columns: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    if not rows:
+        return columns
+    names = np.array([r[0] for r in rows], dtype=object)
+    t_us = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r[2] for r in rows), dtype=float, count=len(rows))
+    bounds = [0, *(np.flatnonzero(names[1:] != names[:-1]) + 1).tolist(), len(rows)]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        columns[names[lo]] = (t_us[lo:hi], values[lo:hi])
+    return columns
+
+
+async def stream_values(
     source: str,
     parameter: str,
     start: datetime,
     end: datetime,
     series: str,
-) -> List[tuple]:
-    table = "swl.raw_measurements" if series == "raw" else "swl.min1_measurements"
+    chunk_rows: int = 50000,
+) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+    # 服务端游标分块读取，返回 (时间[Unix 毫秒], 值) 数组块，内存占用与区间长度无关
     q = (
-        f"SELECT time, source, parameter, value, quality FROM {table}\n"
-        "WHERE source = %s AND parameter = %s AND time >= %s AND time <= %s\n"
+        "SELECT (EXTRACT(EPOCH FROM time) * 1000)::int8 AS t_ms, value\n"
+        f"FROM {_relation(series)}\n"
+        "WHERE source = %(source)s AND parameter = %(parameter)s AND time >= %(start)s AND time <= %(end)s\n"
         "ORDER BY time ASC"
     )
+    params = {"source": source, "parameter": parameter, "start": start, "end": end}
+    record_sql(q, params)
+    async with db_pool.transaction() as conn:
+        async with conn.cursor(name="swl_stream_values", row_factory=tuple_row) as cur:
+            await cur.execute(q, params)
+            while True:
+                with phase("db"):
+                    rows = await cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                t_ms = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+                values = np.fromiter((r[1] for r in rows), dtype=float, count=len(rows))
+                yield t_ms, values
+
+
+async def _merge_coverage(
+    conn,
+    source: str,
+    parameter: str,
+    intervals: List[Interval],
+    max_gap_ms: int,
+) -> int:
+    lo = from_ms(intervals[0][0] - max_gap_ms)
+    hi = from_ms(intervals[-1][1] + max_gap_ms)
+    # 同一序列的区间合并需串行，避免并发写入产生重叠区间
+    await conn.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{source}/{parameter}",))
+    cur = await conn.execute(
+        "DELETE FROM swl.series_coverage\n"
+        "WHERE source = %s AND parameter = %s AND start_time <= %s AND end_time >= %s\n"
+        "RETURNING start_time, end_time",
+        (source, parameter, hi, lo),
+    )
+    existing = [(to_ms(r["start_time"]), to_ms(r["end_time"])) for r in await cur.fetchall()]
+    merged = merge_intervals(existing + intervals, max_gap_ms)
+    async with conn.cursor() as cur:
+        await cur.executemany(
+            "INSERT INTO swl.series_coverage (source, parameter, start_time, end_time)\n"
+            "VALUES (%s, %s, %s, %s)",
+            [(source, parameter, from_ms(s), from_ms(e)) for s, e in merged],
+        )
+    return len(merged)
+
+
+# (batch_key, content_hash, source, parameter, rows, response)
+IngestRecord = Tuple[str, str, str, str, int, Dict[str, Any]]
+
+
+async def write_ingest(
+    raw_rows: List[tuple],
+    min1_rows: List[tuple],
+    coverage: Dict[Tuple[str, str], List[Interval]],
+    max_gap_ms: int,
+    record: Callable[[UpsertCounts, UpsertCounts], List[IngestRecord]],
+) -> Tuple[UpsertCounts, UpsertCounts]:
+    """在一个事务内写入 raw/min1（可跨多个序列）并更新目录与覆盖索引。
+
+    record 由写入计数生成批次记录，与数据在同一事务中提交，重放判断与写入结果一致。
+    """
     async with db_pool.transaction() as conn:
-        cur = await conn.execute(q, (source, parameter, start, end))
+        async with conn.cursor() as cur:
+            inserted, raw = await _write_measurements(cur, "swl.raw_measurements", "raw", raw_rows)
+            _, min1 = await _write_measurements(cur, "swl.min1_measurements", "min1", min1_rows)
+        # 没有新主键的序列覆盖范围不会变化；按固定顺序加锁
+        for key in sorted(coverage):
+            if inserted.get(key) and coverage[key]:
+                await _merge_coverage(conn, key[0], key[1], coverage[key], max_gap_ms)
+        records = record(raw, min1)
+        if records:
+            async with conn.cursor() as cur:
+                await cur.executemany(
+                    "INSERT INTO swl.ingest_batches (batch_key, content_hash, source, parameter, rows, response)\n"
+                    "VALUES (%s, %s, %s, %s, %s, %s)\n"
+                    "ON CONFLICT (batch_key) DO UPDATE SET\n"
+                    "  content_hash = EXCLUDED.content_hash, response = EXCLUDED.response, received_at = now()",
+                    [(k, h, src, prm, n, Jsonb(resp)) for k, h, src, prm, n, resp in records],
+                )
+    return raw, min1
+
+
+_FINITE = "value NOT IN ('NaN'::float8, 'Infinity'::float8, '-Infinity'::float8)"
+
+
+async def query_stats(
+    source: str,
+    parameter: str,
+    start: datetime,
+    end: datetime,
+    series: str,
+    percentiles: List[float],
+    approximate: bool = False,
+) -> dict:
+    where = (
+        f"FROM {_relation(series)}\n"
+        "WHERE source = %(source)s AND parameter = %(parameter)s AND time >= %(start)s AND time <= %(end)s\n"
+        f"  AND {_FINITE}\n"
+    )
+    if approximate:
+        # 需要 timescaledb_toolkit：UddSketch 近似分位数，单次扫描、内存恒定
+        q = (
+            "WITH agg AS (\n"
+            "  SELECT count(value) AS count, avg(value) AS mean, stddev_samp(value) AS std,\n"
+            "         min(value) AS min, max(value) AS max, percentile_agg(value) AS sketch\n"
+            f"  {where})\n"
+            "SELECT count, mean, std, min, max,\n"
+            "       ARRAY(SELECT approx_percentile(p, sketch) FROM unnest(%(percentiles)s::float8[]) AS p) AS percentiles\n"
+            "FROM agg"
+        )
+    else:
+        q = (
+            "SELECT count(value) AS count, avg(value) AS mean, stddev_samp(value) AS std,\n"
+            "       min(value) AS min, max(value) AS max,\n"
+            "       percentile_cont(%(percentiles)s::float8[]) WITHIN GROUP (ORDER BY value) AS percentiles\n"
+            f"{where}"
+        )
+    params = {"source": source, "parameter": parameter, "start": start, "end": end, "percentiles": percentiles}
+    async with db_pool.transaction() as conn:
+        record_sql(q, params)
+        with phase("db"):
+            cur = await conn.execute(q, params)
+            row = await cur.fetchone()
+    return row
+
+
+async def query_histogram(
+    source: str,
+    parameter: str,
+    start: datetime,
+    end: datetime,
+    series: str,
+    lo: float,
+    hi: float,
+    bins: int,
+) -> Dict[int, int]:
+    # width_bucket: 0 为低于 lo，bins + 1 为不低于 hi
+    q = (
+        "SELECT width_bucket(value, %(lo)s, %(hi)s, %(bins)s) AS bucket, count(*) AS n\n"
+        f"FROM {_relation(series)}\n"
+        "WHERE source = %(source)s AND parameter = %(parameter)s AND time >= %(start)s AND time <= %(end)s\n"
+        f"  AND {_FINITE}\n"
+        "GROUP BY bucket"
+    )
+    params = {
+        "lo": lo,
+        "hi": hi,
+        "bins": bins,
+        "source": source,
+        "parameter": parameter,
+        "start": start,
+        "end": end,
+    }
+    async with db_pool.transaction() as conn:
+        record_sql(q, params)
+        with phase("db"):
+            cur = await conn.execute(q, params)
+            rows = await cur.fetchall()
+    return {r["bucket"]: r["n"] for r in rows}
+
+
+async def query_coverage(
+    source: str,
+    parameter: str,
+    start: datetime,
+    end: datetime,
+) -> List[Interval]:
+    q = (
+        "SELECT start_time, end_time FROM swl.series_coverage\n"
+        "WHERE source = %s AND parameter = %s AND start_time <= %s AND end_time >= %s\n"
+        "ORDER BY start_time ASC"
+    )
+    async with db_pool.transaction() as conn:
+        record_sql(q, (source, parameter, end, start))
+        with phase("db"):
+            cur = await conn.execute(q, (source, parameter, end, start))
+            rows = await cur.fetchall()
+    return [(to_ms(r["start_time"]), to_ms(r["end_time"])) for r in rows]
+
+
+async def get_catalog_entry(source: str, parameter: str) -> Optional[dict]:
+    q = (
+        "SELECT source, parameter, first_time, last_time, raw_rows, min1_rows,\n"
+        "       value_min, value_max, last_ingest_at\n"
+        "FROM swl.series_catalog WHERE source = %s AND parameter = %s"
+    )
+    async with db_pool.transaction() as conn:
+        cur = await conn.execute(q, (source, parameter))
+        return await cur.fetchone()
+
+
+async def list_catalog(source: Optional[str] = None) -> List[dict]:
+    q = (
+        "SELECT source, parameter, first_time, last_time, raw_rows, min1_rows,\n"
+        "       value_min, value_max, last_ingest_at\n"
+        "FROM swl.series_catalog\n"
+    )
+    params: tuple = ()
+    if source is not None:
+        q += "WHERE source = %s\n"
+        params = (source,)
+    q += "ORDER BY source, parameter"
+    async with db_pool.transaction() as conn:
+        cur = await conn.execute(q, params)
         rows = await cur.fetchall()
     return rows
 
 
+async def find_ingest_batches(batch_keys: List[str], retention_h: int) -> Dict[str, dict]:
+    q = (
+        "SELECT batch_key, content_hash, response FROM swl.ingest_batches\n"
+        "WHERE batch_key = ANY(%s) AND received_at >= now() - make_interval(hours => %s)"
+    )
+    async with db_pool.transaction() as conn:
+        cur = await conn.execute(q, (batch_keys, retention_h))
+        rows = await cur.fetchall()
+    return {r["batch_key"]: r for r in rows}
+
+
+async def expire_ingest_batches(retention_h: int) -> None:
+    async with db_pool.transaction() as conn:
+        await conn.execute(
+            "DELETE FROM swl.ingest_batches WHERE received_at < now() - make_interval(hours => %s)",
+            (retention_h,),
+        )
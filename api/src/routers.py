@@ -1,75 +1,308 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import aclosing
 from datetime import datetime
-import math
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+import numpy as np
+import orjson
+from psycopg import errors
 
+from .admission import ingest_admission
+from .buffer import ingest_buffer
+from .config import settings
+from .coverage import clip_intervals, from_ms, gaps_between, to_ms
+from .derived import DERIVED, is_materialized, query_derived
+from .events import RunDetector
+from .ingest import apply_batches, prepare_batch
+from .live import live_hub
+from .planner import plan_query, stream_series
+from .profiling import mark, phase
 from .models import (
+    CoverageRequest,
+    CoverageResponse,
+    DerivedInfo,
+    EventOut,
+    EventsRequest,
+    EventsResponse,
+    Histogram,
     IngestResponse,
     MeasurementIn,
     MeasurementOut,
     QueryRequest,
+    SeriesInfo,
+    StatsRequest,
+    StatsResponse,
+)
+from .repository import (
+    get_catalog_entry,
+    list_catalog,
+    query_coverage,
+    query_histogram,
+    query_series,
+    query_stats,
+    stream_values,
 )
-from .interpolation import is_regular_1min_series, linear_interpolate_to_minute
-from .repository import insert_min1, insert_raw, query_series
 
 
 router = APIRouter()
 
 
 @router.post("/ingest", response_model=IngestResponse)
-async def ingest(measurements: List[MeasurementIn]) -> IngestResponse:
+async def ingest(
+    measurements: List[MeasurementIn],
+    idempotency_key: Optional[str] = Header(default=None),
+) -> IngestResponse:
     if not measurements:
         return IngestResponse(stored_raw=0, stored_min1=0)
 
-    # Validate single source/parameter batch to simplify pipeline
-    src = {m.source for m in measurements}
-    prm = {m.parameter for m in measurements}
-    if len(src) != 1 or len(prm) != 1:
-        raise HTTPException(status_code=400, detail="每次上传应为同一 source 与 parameter 的批次")
-
-    source = next(iter(src))
-    parameter = next(iter(prm))
+    with phase("prepare"):
+        batch = prepare_batch(measurements, idempotency_key)
+    if ingest_buffer.running:
+        return await ingest_buffer.submit(batch)
 
-    tuples = [(m.time, m.source, m.parameter, m.value, m.quality) for m in measurements]
-    stored_raw = await insert_raw(tuples)
+    # 限制同时写入的请求/行数，超限返回 429 + Retry-After，而不是在连接池上排队超时
+    async with ingest_admission.admit(len(batch.raw_rows)):
+        (result,) = await apply_batches([batch])
+    if isinstance(result, HTTPException):
+        raise result
+    mark("returned")
+    return result
 
-    # 生成/复制 1 分钟序列（如存在 NaN/Inf，则用线性插值填充，确保无 NaN）
-    times = [m.time for m in measurements]
-    start, end = min(times), max(times)
-    pts = [(m.time, m.value) for m in measurements]
-    all_finite = all(math.isfinite(v) for _, v in pts)
-    if is_regular_1min_series(pts) and all_finite:
-        tuples_min1 = [(t, source, parameter, v, None) for t, v in pts]
-    else:
-        interp = linear_interpolate_to_minute(pts, start, end)
-        tuples_min1 = [(t, source, parameter, v, None) for t, v in interp]
-    stored_min1 = await insert_min1(tuples_min1)
 
-    return IngestResponse(stored_raw=stored_raw, stored_min1=stored_min1)
+async def _stored_series(source: str, parameter: str, series: str, start: datetime, end: datetime) -> bool:
+    entry = await get_catalog_entry(source, parameter)
+    if entry is None:
+        return False
+    if entry["raw_rows"] > 0:
+        # 数据源自带的同名序列优先返回存储的数据
+        return entry[f"{series}_rows"] > 0
+    # 物化行只从开启 DERIVED_MATERIALIZE 后写入的输入开始存在：
+    # 请求区间超出已物化的范围时改为现场计算
+    return (
+        series == "min1"
+        and entry["min1_rows"] > 0
+        and to_ms(entry["first_time"]) <= to_ms(start)
+        and to_ms(end) < to_ms(entry["last_time"]) + 60_000
+    )
 
 
 @router.post("/query", response_model=List[MeasurementOut])
 async def query(req: QueryRequest) -> List[MeasurementOut]:
     if req.end <= req.start:
         raise HTTPException(status_code=400, detail="end 必须大于 start")
+    if req.parameter in DERIVED and not await _stored_series(
+        req.source, req.parameter, req.series, req.start, req.end
+    ):
+        # 衍生参数：由输入序列按时间对齐后在服务端计算
+        pts = await query_derived(req.source, req.parameter, req.start, req.end, req.series)
+        with phase("build"):
+            out = [
+                MeasurementOut(time=t, source=req.source, parameter=req.parameter, value=v)
+                for t, v in pts
+            ]
+        mark("returned")
+        return out
+    parts = await plan_query(req.source, req.parameter, req.start, req.end, req.series)
+    if not parts:
+        return []
+    if len(parts) > 1:
+        # 跨多个 chunk：并发子查询，按时间顺序流式返回
+        return StreamingResponse(
+            stream_series(req.source, req.parameter, parts, req.series),
+            media_type="application/json",
+        )
     rows = await query_series(req.source, req.parameter, req.start, req.end, req.series)
+    with phase("build"):
+        out = [
+            MeasurementOut(
+                time=r["time"],
+                source=r["source"],
+                parameter=r["parameter"],
+                value=r["value"],
+                quality=r.get("quality"),
+            )
+            for r in rows
+        ]
+    mark("returned")
+    return out
+
+
+@router.post("/stats", response_model=StatsResponse)
+async def stats(req: StatsRequest) -> StatsResponse:
+    if req.end <= req.start:
+        raise HTTPException(status_code=400, detail="end 必须大于 start")
+    if any(not 0.0 <= p <= 1.0 for p in req.percentiles):
+        raise HTTPException(status_code=400, detail="percentiles 取值应在 [0, 1]")
+    try:
+        row = await query_stats(
+            req.source, req.parameter, req.start, req.end, req.series, req.percentiles, req.approximate
+        )
+    except errors.UndefinedFunction:
+        raise HTTPException(status_code=400, detail="近似分位数需要 timescaledb_toolkit 扩展")
+    pct = row["percentiles"] or [None] * len(req.percentiles)
+
+    histogram = None
+    if req.bins and row["count"]:
+        lo = req.hist_min if req.hist_min is not None else row["min"]
+        hi = req.hist_max if req.hist_max is not None else row["max"]
+        if hi <= lo:
+            if req.hist_min is not None or req.hist_max is not None:
+                raise HTTPException(status_code=400, detail="hist_max 必须大于 hist_min（未指定的一端取数据的最小/最大值）")
+            # 两端均取默认值且数据为常数时，展宽为单位区间
+            hi = lo + 1.0
+        buckets = await query_histogram(req.source, req.parameter, req.start, req.end, req.series, lo, hi, req.bins)
+        counts = [buckets.get(i, 0) for i in range(1, req.bins + 1)]
+        above = buckets.get(req.bins + 1, 0)
+        if req.hist_max is None:
+            # 上界默认取最大值：等于上界的样本计入最后一箱
+            counts[-1] += above
+            above = 0
+        histogram = Histogram(
+            edges=np.linspace(lo, hi, req.bins + 1).tolist(),
+            counts=counts,
+            below=buckets.get(0, 0),
+            above=above,
+        )
+
+    return StatsResponse(
+        source=req.source,
+        parameter=req.parameter,
+        series=req.series,
+        count=row["count"],
+        mean=row["mean"],
+        std=row["std"],
+        min=row["min"],
+        max=row["max"],
+        percentiles={f"{p:g}": v for p, v in zip(req.percentiles, pct)},
+        histogram=histogram,
+    )
+
+
+@router.post("/events", response_model=EventsResponse)
+async def events(req: EventsRequest) -> EventsResponse:
+    if req.end <= req.start:
+        raise HTTPException(status_code=400, detail="end 必须大于 start")
+    detector = RunDetector(
+        req.op, req.threshold, int(req.max_gap_s * 1000), int(req.min_duration_s * 1000)
+    )
+    runs: List[dict] = []
+    # 分块流式扫描，只保留命中的区间；提前结束时 aclosing 立即释放游标与连接
+    chunks = stream_values(req.source, req.parameter, req.start, req.end, req.series)
+    async with aclosing(chunks):
+        async for t_ms, values in chunks:
+            runs.extend(detector.feed(t_ms, values))
+            if len(runs) > req.max_events:
+                break
+        else:
+            runs.extend(detector.finish())
+    truncated = len(runs) > req.max_events
+    return EventsResponse(
+        source=req.source,
+        parameter=req.parameter,
+        series=req.series,
+        condition=f"{req.parameter} {req.op} {req.threshold:g}",
+        events=[
+            EventOut(
+                start=from_ms(r["start_ms"]),
+                end=from_ms(r["end_ms"]),
+                duration_s=(r["end_ms"] - r["start_ms"]) / 1000,
+                count=r["count"],
+                mean=r["sum"] / r["count"],
+                min=r["min"],
+                max=r["max"],
+            )
+            for r in runs[: req.max_events]
+        ],
+        truncated=truncated,
+    )
+
+
+@router.get("/derived", response_model=List[DerivedInfo])
+async def derived() -> List[DerivedInfo]:
     return [
-        MeasurementOut(
-            time=r["time"],
-            source=r["source"],
-            parameter=r["parameter"],
-            value=r["value"],
-            quality=r.get("quality"),
+        DerivedInfo(
+            name=name,
+            inputs=list(spec.inputs),
+            unit=spec.unit,
+            description=spec.description,
+            materialized=is_materialized(name),
         )
-        for r in rows
+        for name, spec in DERIVED.items()
     ]
 
 
+@router.post("/coverage", response_model=CoverageResponse)
+async def coverage(req: CoverageRequest) -> CoverageResponse:
+    if req.end <= req.start:
+        raise HTTPException(status_code=400, detail="end 必须大于 start")
+    start_ms, end_ms = to_ms(req.start), to_ms(req.end)
+    intervals = await query_coverage(req.source, req.parameter, req.start, req.end)
+    covered = clip_intervals(intervals, start_ms, end_ms)
+    return CoverageResponse(
+        source=req.source,
+        parameter=req.parameter,
+        start_ms=start_ms,
+        end_ms=end_ms,
+        max_gap_ms=settings.coverage_max_gap_ms,
+        covered=covered,
+        gaps=gaps_between(covered, start_ms, end_ms),
+    )
+
+
+@router.get("/series", response_model=List[SeriesInfo])
+async def series(source: Optional[str] = None) -> List[SeriesInfo]:
+    rows = await list_catalog(source)
+    return [SeriesInfo(**r) for r in rows]
+
+
+@router.websocket("/live")
+async def live(ws: WebSocket) -> None:
+    await ws.accept()
+    try:
+        req = orjson.loads(await ws.receive_text())
+        keys = [(str(s["source"]), str(s["parameter"])) for s in req["series"]]
+        tiers = [t for t in req.get("tiers", ["min1"]) if t in ("raw", "min1")]
+    except WebSocketDisconnect:
+        return
+    except (ValueError, KeyError, TypeError):
+        await ws.close(code=1008, reason="订阅格式应为 {series: [{source, parameter}], tiers: [raw|min1]}")
+        return
+    if not keys or not tiers:
+        await ws.close(code=1008, reason="至少订阅一个序列与一个层级")
+        return
+
+    sub = live_hub.subscribe(keys, tiers)
+
+    async def pump() -> None:
+        reported = 0
+        while True:
+            msg = await sub.queue.get()
+            if sub.dropped != reported:
+                await ws.send_text(f'{{"type":"lag","dropped":{sub.dropped - reported}}}')
+                reported = sub.dropped
+            await ws.send_text(msg.decode())
+
+    sender = asyncio.create_task(pump())
+    try:
+        # 客户端无需再发送消息，这里只用于感知断开
+        while True:
+            await ws.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        live_hub.unsubscribe(sub)
+
+
 @router.get("/health")
 async def health() -> dict:
+    if ingest_buffer.running:
+        return {"status": "ok", "ingest_buffer": ingest_buffer.stats}
     return {"status": "ok"}
 
 
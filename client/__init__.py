@@ -3,14 +3,17 @@ from __future__ import annotations
 __all__ = [
     "health_check",
     "ingest_csv",
+    "ingest_file",
     "query_series",
+    "query_coverage",
+    "list_series",
     "plot_compare",
 ]
 
 # Re-export key functions for convenience
 from .api import health_check  # noqa: E402,F401
-from .ingest import ingest_csv  # noqa: E402,F401
-from .query import query_series  # noqa: E402,F401
+from .ingest import ingest_csv, ingest_file  # noqa: E402,F401
+from .query import list_series, query_coverage, query_series  # noqa: E402,F401
 from .plot import plot_compare  # noqa: E402,F401
 
 
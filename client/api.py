@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from urllib import request
+from urllib import parse, request
 
 
 def _join(base: str, path: str) -> str:
@@ -19,6 +19,15 @@ def health_check(api_base: str, timeout_s: int = 10) -> Dict[str, Any]:
     return data
 
 
+def get_json(api_base: str, path: str, params: Optional[Dict[str, Any]] = None, timeout_s: int = 60) -> Any:
+    url = _join(api_base, path)
+    if params:
+        url += "?" + parse.urlencode({k: v for k, v in params.items() if v is not None})
+    with request.urlopen(url, timeout=timeout_s) as resp:
+        body = resp.read().decode("utf-8")
+        return json.loads(body) if body else {}
+
+
 def post_json(api_base: str, path: str, payload: Any, timeout_s: int = 60) -> Any:
     url = _join(api_base, path)
     data = json.dumps(payload).encode("utf-8")
@@ -5,8 +5,8 @@ import json
 import sys
 
 from .api import health_check
-from .ingest import ingest_csv
-from .query import query_series, save_points
+from .ingest import ingest_csv, ingest_file
+from .query import list_series, query_coverage, query_series, save_points
 from .plot import plot_compare
 
 
@@ -17,13 +17,28 @@ def main() -> None:
 
     p_health = sub.add_parser("health", help="Check API health")
 
-    p_ingest = sub.add_parser("ingest", help="Ingest CSV in batches")
-    p_ingest.add_argument("--file", required=True, help="Path to CSV file")
-    p_ingest.add_argument("--source", required=True, help="Source name")
-    p_ingest.add_argument("--parameter", required=True, help="Parameter name")
+    p_ingest = sub.add_parser("ingest", help="Ingest CSV, CDF or Parquet in batches")
+    p_ingest.add_argument("--file", required=True, help="Path to .csv, .cdf or .parquet file")
+    p_ingest.add_argument("--source", help="Source name (default source for --map)")
+    p_ingest.add_argument("--parameter", help="Parameter name (CSV only)")
+    p_ingest.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        help="CDF/Parquet: VAR[=SOURCE:PARAMETER] or VAR[i]=PARAMETER; repeatable",
+    )
+    p_ingest.add_argument("--time-column", default="Time", help="Parquet time column")
     p_ingest.add_argument("--batch-size", type=int, default=1000)
-    p_ingest.add_argument("--sleep-ms", type=int, default=50)
     p_ingest.add_argument("--max-batches", type=int, default=0)
+    p_ingest.add_argument("--rate", type=float, default=5000.0, help="Initial send rate (rows/s), adapted by AIMD")
+    p_ingest.add_argument("--max-rate", type=float, default=0.0, help="Upper bound for send rate (0 = unlimited)")
+    p_ingest.add_argument("--target-latency-ms", type=int, default=2000, help="Back off when a batch takes longer")
+    # 已废弃：发送节奏由 AIMD 控制，保留该选项只为兼容旧的命令行
+    p_ingest.add_argument("--sleep-ms", type=int, default=None, help=argparse.SUPPRESS)
+
+    p_list = sub.add_parser("list", help="List known (source, parameter) series from the catalog")
+    p_list.add_argument("--source", help="Only list series of this source")
+    p_list.add_argument("--json", action="store_true", help="Print raw JSON instead of a table")
 
     p_query = sub.add_parser("query", help="Query time range and print count (optional export)")
     p_query.add_argument("--source", required=True)
@@ -33,6 +48,12 @@ def main() -> None:
     p_query.add_argument("--series", default="raw", choices=["raw", "min1"])
     p_query.add_argument("--out", help="Optional export path (.json or .csv). If omitted, not saved.")
 
+    p_cov = sub.add_parser("coverage", help="Show covered intervals and gaps (epoch ms)")
+    p_cov.add_argument("--source", required=True)
+    p_cov.add_argument("--parameter", required=True)
+    p_cov.add_argument("--start", required=True, help="ISO8601, e.g. 2004-11-07T00:00:00Z")
+    p_cov.add_argument("--end", required=True, help="ISO8601, e.g. 2004-11-08T00:00:00Z")
+
     p_plot = sub.add_parser("plot-compare", help="Plot raw vs min1 and save PNG")
     p_plot.add_argument("--source", required=True)
     p_plot.add_argument("--parameter", required=True)
@@ -48,19 +69,57 @@ def main() -> None:
         print(json.dumps(data, ensure_ascii=False))
         return
 
+    if args.cmd == "ingest" and args.sleep_ms is not None:
+        print("[WARN] --sleep-ms is deprecated and ignored; use --rate/--max-rate instead", file=sys.stderr)
+
+    if args.cmd == "ingest" and args.file.lower().endswith((".cdf", ".parquet", ".pq")):
+        if not args.map:
+            parser.error("--map is required for CDF/Parquet files")
+        result = ingest_file(
+            api_base=args.api,
+            path=args.file,
+            mappings=args.map,
+            source=args.source,
+            time_column=args.time_column,
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+            initial_rate=args.rate,
+            max_rate=args.max_rate,
+            target_latency_ms=args.target_latency_ms,
+        )
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
     if args.cmd == "ingest":
+        if not args.source or not args.parameter:
+            parser.error("--source and --parameter are required for CSV files")
         result = ingest_csv(
             api_base=args.api,
             csv_path=args.file,
             source=args.source,
             parameter=args.parameter,
             batch_size=args.batch_size,
-            sleep_ms=args.sleep_ms,
             max_batches=args.max_batches,
+            initial_rate=args.rate,
+            max_rate=args.max_rate,
+            target_latency_ms=args.target_latency_ms,
         )
         print(json.dumps(result, ensure_ascii=False))
         return
 
+    if args.cmd == "list":
+        items = list_series(args.api, args.source)
+        if args.json:
+            print(json.dumps(items, ensure_ascii=False))
+            return
+        print("source\tparameter\tfirst_time\tlast_time\traw_rows\tmin1_rows")
+        for it in items:
+            print(
+                f"{it['source']}\t{it['parameter']}\t{it['first_time']}\t{it['last_time']}"
+                f"\t{it['raw_rows']}\t{it['min1_rows']}"
+            )
+        return
+
     if args.cmd == "query":
         pts = query_series(args.api, args.source, args.parameter, args.start, args.end, args.series)
         print(len(pts))
@@ -69,6 +128,11 @@ def main() -> None:
             print(f"[OK] 导出: {out_path}")
         return
 
+    if args.cmd == "coverage":
+        data = query_coverage(args.api, args.source, args.parameter, args.start, args.end)
+        print(json.dumps(data, ensure_ascii=False))
+        return
+
     if args.cmd == "plot-compare":
         out = plot_compare(args.api, args.source, args.parameter, args.start, args.end, args.out, args.show)
         if out:
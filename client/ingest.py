@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import csv
+import socket
 import time
+import warnings
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterator, List
+from typing import Any, Dict, Iterator, List, Optional
+
+from urllib import error
 
 from .api import post_json
 
@@ -59,31 +63,188 @@ def stream_csv_rows(csv_path: str, source: str, parameter: str) -> Iterator[Dict
             }
 
 
-def ingest_csv(
+class AimdRateController:
+    """加性增、乘性减（AIMD）的发送速率控制，单位：行/秒。
+
+    - 请求成功且延迟不超过目标值：速率 += increase
+    - 服务端返回 429/503、超时，或延迟超过目标值：速率 *= decrease
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 5000.0,
+        min_rate: float = 100.0,
+        max_rate: float = 0.0,
+        increase: float = 500.0,
+        decrease: float = 0.5,
+        target_latency_s: float = 2.0,
+    ) -> None:
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency_s = target_latency_s
+
+    def _clamp(self) -> None:
+        self.rate = max(self.min_rate, self.rate)
+        if self.max_rate > 0:
+            self.rate = min(self.max_rate, self.rate)
+
+    def on_success(self, latency_s: float) -> None:
+        if latency_s > self.target_latency_s:
+            self.rate *= self.decrease
+        else:
+            self.rate += self.increase
+        self._clamp()
+
+    def on_overload(self) -> None:
+        self.rate *= self.decrease
+        self._clamp()
+
+    def pause_s(self, rows: int, elapsed_s: float) -> float:
+        # 按当前速率发送 rows 行所需时间，扣除请求本身已耗费的时间
+        return max(0.0, rows / self.rate - elapsed_s)
+
+
+def _retry_after_s(exc: error.HTTPError, default: float) -> float:
+    try:
+        return max(0.0, float(exc.headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def post_batch_adaptive(
     api_base: str,
-    csv_path: str,
-    source: str,
-    parameter: str,
-    batch_size: int = 1000,
-    sleep_ms: int = 50,
+    batch: List[Dict[str, Any]],
+    controller: AimdRateController,
+    max_retries: int = 10,
+    timeout_s: int = 60,
+) -> Dict[str, Any]:
+    # 服务端写入幂等，整批重试是安全的
+    for attempt in range(max_retries + 1):
+        t0 = time.monotonic()
+        try:
+            result = post_json(api_base, "/v1/ingest", batch, timeout_s=timeout_s)
+        except error.HTTPError as exc:
+            if exc.code not in (429, 503) or attempt == max_retries:
+                raise
+            controller.on_overload()
+            time.sleep(_retry_after_s(exc, default=1.0))
+            continue
+        except (error.URLError, socket.timeout, TimeoutError):
+            if attempt == max_retries:
+                raise
+            controller.on_overload()
+            time.sleep(min(30.0, 2.0 ** attempt))
+            continue
+        controller.on_success(time.monotonic() - t0)
+        return result
+    raise RuntimeError("unreachable")
+
+
+def _send_batches(
+    api_base: str,
+    batches: Iterator[List[Dict[str, Any]]],
+    ctl: AimdRateController,
     max_batches: int = 0,
 ) -> Dict[str, int]:
     total_rows = 0
     total_raw = 0
     total_min1 = 0
+    total_unchanged = 0
+    total_replayed = 0
     start_time = time.time()
 
-    for i, batch in enumerate(batched(stream_csv_rows(csv_path, source, parameter), batch_size), start=1):
-        result = post_json(api_base, "/v1/ingest", batch, timeout_s=60)
+    for i, batch in enumerate(batches, start=1):
+        t0 = time.monotonic()
+        result = post_batch_adaptive(api_base, batch, ctl)
         total_rows += len(batch)
         total_raw += int(result.get("stored_raw", 0))
         total_min1 += int(result.get("stored_min1", 0))
+        total_unchanged += int(result.get("unchanged_raw", 0))
+        total_replayed += int(bool(result.get("replayed", False)))
 
-        time.sleep(max(0, sleep_ms / 1000.0))
         if max_batches and i >= max_batches:
             break
+        time.sleep(ctl.pause_s(len(batch), time.monotonic() - t0))
 
     elapsed_s = time.time() - start_time
-    return {"rows": total_rows, "raw": total_raw, "min1": total_min1, "elapsed_s": int(elapsed_s)}
+    return {
+        "rows": total_rows,
+        "raw": total_raw,
+        "min1": total_min1,
+        "unchanged": total_unchanged,
+        "replayed_batches": total_replayed,
+        "final_rate": int(ctl.rate),
+        "elapsed_s": int(elapsed_s),
+    }
+
+
+def ingest_csv(
+    api_base: str,
+    csv_path: str,
+    source: str,
+    parameter: str,
+    batch_size: int = 1000,
+    sleep_ms: Optional[int] = None,
+    max_batches: int = 0,
+    *,
+    initial_rate: float = 5000.0,
+    max_rate: float = 0.0,
+    target_latency_ms: int = 2000,
+    controller: Optional[AimdRateController] = None,
+) -> Dict[str, int]:
+    # sleep_ms 仅为兼容旧的位置参数调用而保留，发送节奏现由 AIMD 控制
+    if sleep_ms is not None:
+        warnings.warn(
+            "ingest_csv(sleep_ms=...) is ignored; use initial_rate/max_rate instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+    ctl = controller or AimdRateController(
+        initial_rate=initial_rate,
+        max_rate=max_rate,
+        target_latency_s=target_latency_ms / 1000.0,
+    )
+    batches = batched(stream_csv_rows(csv_path, source, parameter), batch_size)
+    return _send_batches(api_base, batches, ctl, max_batches)
 
 
+def ingest_file(
+    api_base: str,
+    path: str,
+    mappings: List[str],
+    source: Optional[str] = None,
+    time_column: str = "Time",
+    batch_size: int = 1000,
+    max_batches: int = 0,
+    initial_rate: float = 5000.0,
+    max_rate: float = 0.0,
+    target_latency_ms: int = 2000,
+    controller: Optional[AimdRateController] = None,
+) -> Dict[str, int]:
+    """直接读取 CDF / Parquet 文件写入，一次读取可映射多个变量与向量分量。
+
+    mappings 形如 `BGSEc=ACE:BGSEc`（展开为 BGSEc_0..2）或 `BGSEc[2]=BZ_GSE`，
+    省略 source 时使用参数 source。Parquet 的时间列由 time_column 指定。
+    """
+    # 延迟导入：CSV 写入不需要 numpy
+    from .readers import column_batches, parse_mapping, read_cdf_columns, read_parquet_columns
+
+    parsed = [parse_mapping(spec, source) for spec in mappings]
+    suffix = path.lower().rsplit(".", 1)[-1]
+    if suffix == "cdf":
+        columns = read_cdf_columns(path, parsed)
+    elif suffix in ("parquet", "pq"):
+        columns = read_parquet_columns(path, parsed, time_column)
+    else:
+        raise ValueError(f"Unsupported file type: {path} (expected .cdf or .parquet)")
+    ctl = controller or AimdRateController(
+        initial_rate=initial_rate,
+        max_rate=max_rate,
+        target_latency_s=target_latency_ms / 1000.0,
+    )
+    result = _send_batches(api_base, column_batches(columns, batch_size), ctl, max_batches)
+    result["series"] = len(columns)
+    return result
@@ -2,14 +2,14 @@ from __future__ import annotations
 
 import json
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import csv
 import json
 
 from urllib import request
 
-from .api import post_json
+from .api import get_json, post_json
 
 
 def parse_iso8601_z(ts: str) -> datetime:
@@ -50,6 +50,26 @@ def query_series(
     return points
 
 
+def query_coverage(
+    api_base: str,
+    source: str,
+    parameter: str,
+    start_iso: str,
+    end_iso: str,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "source": source,
+        "parameter": parameter,
+        "start": start_iso,
+        "end": end_iso,
+    }
+    return post_json(api_base, "/v1/coverage", payload, timeout_s=60)
+
+
+def list_series(api_base: str, source: Optional[str] = None) -> List[Dict[str, Any]]:
+    return get_json(api_base, "/v1/series", {"source": source}, timeout_s=60)
+
+
 def save_points(out_path: str, points: List[Tuple[datetime, float]], source: str, parameter: str) -> str:
     ext = os.path.splitext(out_path)[1].lower()
     if ext in (".json", ""):
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class ColumnMapping(NamedTuple):
+    """文件中的一列（或向量的一个分量）到 (source, parameter) 的映射。"""
+
+    variable: str
+    component: Optional[int]
+    source: str
+    parameter: str
+
+
+# (source, parameter) -> (时间[Unix 微秒, int64], 值[float64])
+Columns = Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]
+
+
+def parse_mapping(spec: str, default_source: Optional[str] = None) -> ColumnMapping:
+    """解析 `VAR[=SOURCE:PARAMETER]`、`VAR[i]=PARAMETER` 形式的映射。
+
+    - `VAR[i]` 取向量变量的第 i 个分量
+    - 省略 `SOURCE:` 时使用 default_source；省略 `=...` 时参数名与变量名相同
+    """
+    lhs, _, rhs = spec.partition("=")
+    lhs = lhs.strip()
+    component: Optional[int] = None
+    if lhs.endswith("]") and "[" in lhs:
+        lhs, _, idx = lhs[:-1].partition("[")
+        component = int(idx)
+    source, _, parameter = rhs.strip().rpartition(":")
+    source = source or default_source or ""
+    parameter = parameter or (lhs if component is None else f"{lhs}_{component}")
+    if not lhs or not source:
+        raise ValueError(f"Invalid mapping {spec!r}; expected VAR[i]=SOURCE:PARAMETER")
+    return ColumnMapping(lhs, component, source, parameter)
+
+
+def _split_components(
+    mapping: ColumnMapping, t_us: np.ndarray, data: np.ndarray, valid: np.ndarray, out: Columns
+) -> None:
+    # 未指定分量的向量变量按 PARAMETER_0、PARAMETER_1 ... 展开
+    if data.ndim == 1:
+        if mapping.component is not None:
+            raise ValueError(f"{mapping.variable} is a scalar; component index not allowed")
+        cols = [(mapping.parameter, data, valid)]
+    elif mapping.component is not None:
+        cols = [(mapping.parameter, data[:, mapping.component], valid[:, mapping.component])]
+    else:
+        cols = [(f"{mapping.parameter}_{i}", data[:, i], valid[:, i]) for i in range(data.shape[1])]
+    for parameter, values, ok in cols:
+        out[(mapping.source, parameter)] = (t_us[ok], values[ok])
+
+
+def _mask_fill(values: np.ndarray, fillval) -> np.ndarray:
+    valid = np.isfinite(values)
+    if fillval is not None:
+        valid &= values != np.asarray(fillval, dtype=float).reshape(-1)[0]
+    return valid
+
+
+def read_cdf_columns(path: str, mappings: List[ColumnMapping]) -> Columns:
+    """用 cdflib（纯 Python）读取 CDF 变量为列式数组。
+
+    时间取自各变量的 DEPEND_0，CDF_EPOCH/EPOCH16/TT2000 均整列转换；
+    FILLVAL 与非有限值被剔除。共用同一时间变量的多个变量只转换一次。
+    """
+    try:
+        import cdflib
+    except Exception:
+        raise RuntimeError("未安装 cdflib。请先执行: python -m pip install cdflib")
+
+    cdf = cdflib.CDF(path)
+    epochs: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    out: Columns = {}
+    for m in mappings:
+        attrs = cdf.varattsget(m.variable)
+        epoch_var = attrs.get("DEPEND_0")
+        if not epoch_var:
+            raise ValueError(f"{m.variable} has no DEPEND_0 time variable")
+        if epoch_var not in epochs:
+            raw = np.asarray(cdf.varget(epoch_var))
+            ok = np.ones(raw.shape, dtype=bool)
+            fill = cdf.varattsget(epoch_var).get("FILLVAL")
+            if fill is not None:
+                ok &= raw != np.asarray(fill).reshape(-1)[0]
+            t_us = np.zeros(raw.shape, dtype=np.int64)
+            if ok.any():
+                dt = cdflib.cdfepoch.to_datetime(raw[ok]).astype("datetime64[us]")
+                t_us[ok] = dt.astype(np.int64)
+                ok[ok] = ~np.isnat(dt)
+            epochs[epoch_var] = (t_us, ok)
+        t_us, t_ok = epochs[epoch_var]
+        data = np.asarray(cdf.varget(m.variable), dtype=float)
+        valid = _mask_fill(data, attrs.get("FILLVAL"))
+        valid &= t_ok.reshape((-1,) + (1,) * (data.ndim - 1))
+        _split_components(m, t_us, data, valid, out)
+    return out
+
+
+def read_parquet_columns(path: str, mappings: List[ColumnMapping], time_column: str = "Time") -> Columns:
+    """用 pyarrow 读取 Parquet 列为列式数组。
+
+    时间列可为 timestamp（无时区按 UTC 处理）或 ISO-8601 字符串；
+    向量分量使用定长 list 列。null 与非有限值被剔除。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except Exception:
+        raise RuntimeError("未安装 pyarrow。请先执行: python -m pip install pyarrow")
+
+    names = sorted({m.variable for m in mappings})
+    table = pq.read_table(path, columns=[time_column, *names])
+    times = table.column(time_column)
+    if not pa.types.is_timestamp(times.type):
+        # 带时区后缀（Z、+08:00）的字符串按其时区解析，否则按 UTC
+        try:
+            times = pc.cast(times, pa.timestamp("ns", tz="UTC"))
+        except pa.ArrowInvalid:
+            times = pc.cast(times, pa.timestamp("ns"))
+    times = pc.cast(times, pa.timestamp("us", tz=times.type.tz), safe=False)
+    t_ok = pc.is_valid(times).to_numpy(zero_copy_only=False)
+    t_us = pc.fill_null(pc.cast(times, pa.int64()), 0).to_numpy()
+    out: Columns = {}
+    for m in mappings:
+        col = table.column(m.variable)
+        if pa.types.is_list(col.type) or pa.types.is_large_list(col.type) or pa.types.is_fixed_size_list(col.type):
+            # 整列展平后重排为 (行, 分量)；null 行补为等长的 null 列表
+            lengths = pc.fill_null(pc.list_value_length(col), 0).to_numpy()
+            width = int(lengths.max()) if len(lengths) else 0
+            if (lengths[lengths > 0] != width).any():
+                raise ValueError(f"{m.variable}: rows have different numbers of components")
+            col = pc.fill_null(col, pa.scalar([None] * width, type=col.type))
+            flat = pc.cast(pc.list_flatten(col), pa.float64())
+            data = pc.fill_null(flat, float("nan")).to_numpy().reshape(-1, width)
+        else:
+            data = pc.fill_null(pc.cast(col, pa.float64()), float("nan")).to_numpy()
+        valid = np.isfinite(data) & t_ok.reshape((-1,) + (1,) * (data.ndim - 1))
+        _split_components(m, t_us, data, valid, out)
+    return out
+
+
+def column_batches(columns: Columns, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """按序列切分为 /v1/ingest 批次；时间整列格式化为 ISO-8601 UTC 字符串。"""
+    for (source, parameter), (t_us, values) in columns.items():
+        times = np.char.add(np.datetime_as_string(t_us.astype("datetime64[us]"), unit="us"), "Z")
+        for lo in range(0, len(t_us), batch_size):
+            yield [
+                {"time": t, "source": source, "parameter": parameter, "value": v}
+                for t, v in zip(times[lo:lo + batch_size].tolist(), values[lo:lo + batch_size].tolist())
+            ]
@@ -64,6 +64,101 @@ SELECT create_hypertable(
 CREATE INDEX IF NOT EXISTS min1_spl_time_idx
   ON swl.min1_measurements (source, parameter, time DESC);
 
+-- Compact min1 layout, used instead of swl.min1_measurements when
+-- MIN1_STORAGE=daily: one row per series and UTC day. vals[i] is the value at
+-- minute i - 1 of the day; NULL elements (the array null bitmap) mark minutes
+-- without data.
+CREATE TABLE IF NOT EXISTS swl.min1_daily (
+  source     TEXT                NOT NULL,
+  parameter  TEXT                NOT NULL,
+  day        DATE                NOT NULL,
+  vals       DOUBLE PRECISION[]  NOT NULL,
+  CONSTRAINT min1_daily_len CHECK (array_lower(vals, 1) = 1 AND array_upper(vals, 1) = 1440),
+  CONSTRAINT min1_daily_pk PRIMARY KEY (source, parameter, day)
+);
+
+-- One-off copy of existing min1 rows when switching to MIN1_STORAGE=daily:
+-- INSERT INTO swl.min1_daily (source, parameter, day, vals)
+-- SELECT s.source, s.parameter, s.day,
+--        ARRAY(SELECT x.v FROM generate_series(0, 1439) AS g
+--              LEFT JOIN unnest(s.mins, s.vs) AS x(m, v) ON x.m = g ORDER BY g)
+-- FROM (
+--   SELECT source, parameter, (time AT TIME ZONE 'UTC')::date AS day,
+--          array_agg((EXTRACT(EPOCH FROM time)::int8 % 86400 / 60)::int) AS mins,
+--          array_agg(value) AS vs
+--   FROM swl.min1_measurements GROUP BY 1, 2, 3
+-- ) s
+-- ON CONFLICT DO NOTHING;
+
+-- Coverage index: merged intervals of existing raw samples per series.
+-- Maintained incrementally by the ingest path (see COVERAGE_MAX_GAP_MS).
+CREATE TABLE IF NOT EXISTS swl.series_coverage (
+  source      TEXT         NOT NULL,
+  parameter   TEXT         NOT NULL,
+  start_time  TIMESTAMPTZ  NOT NULL,
+  end_time    TIMESTAMPTZ  NOT NULL,
+  CONSTRAINT coverage_range CHECK (end_time >= start_time),
+  CONSTRAINT coverage_pk PRIMARY KEY (source, parameter, start_time)
+);
+
+-- One-off backfill for databases that already hold data (slow; run once).
+-- The interval must match COVERAGE_MAX_GAP_MS. With QUERY_SKIP_UNCOVERED=true,
+-- /v1/query skips raw ranges the index reports as empty, so an incomplete
+-- index hides existing data.
+-- INSERT INTO swl.series_coverage (source, parameter, start_time, end_time)
+-- SELECT source, parameter, min(time), max(time)
+-- FROM (
+--   SELECT source, parameter, time,
+--          count(*) FILTER (WHERE gap) OVER (PARTITION BY source, parameter ORDER BY time) AS grp
+--   FROM (
+--     SELECT source, parameter, time,
+--            time - lag(time) OVER (PARTITION BY source, parameter ORDER BY time) > INTERVAL '300 seconds' AS gap
+--     FROM swl.raw_measurements
+--   ) t
+-- ) g
+-- GROUP BY source, parameter, grp
+-- ON CONFLICT DO NOTHING;
+
+-- Series catalog: one row per (source, parameter), maintained on ingest so that
+-- discovery never scans the measurement hypertables.
+CREATE TABLE IF NOT EXISTS swl.series_catalog (
+  source          TEXT              NOT NULL,
+  parameter       TEXT              NOT NULL,
+  first_time      TIMESTAMPTZ       NOT NULL,
+  last_time       TIMESTAMPTZ       NOT NULL,
+  raw_rows        BIGINT            NOT NULL DEFAULT 0,
+  min1_rows       BIGINT            NOT NULL DEFAULT 0,
+  value_min       DOUBLE PRECISION,
+  value_max       DOUBLE PRECISION,
+  last_ingest_at  TIMESTAMPTZ       NOT NULL DEFAULT now(),
+  CONSTRAINT catalog_pk PRIMARY KEY (source, parameter)
+);
+
+-- One-off backfill for databases that already hold data (slow; run once):
+-- INSERT INTO swl.series_catalog (source, parameter, first_time, last_time, raw_rows, value_min, value_max)
+-- SELECT source, parameter, min(time), max(time), count(*), min(value), max(value)
+-- FROM swl.raw_measurements GROUP BY source, parameter
+-- ON CONFLICT (source, parameter) DO NOTHING;
+-- UPDATE swl.series_catalog c SET min1_rows = m.n
+-- FROM (SELECT source, parameter, count(*) AS n FROM swl.min1_measurements GROUP BY 1, 2) m
+-- WHERE c.source = m.source AND c.parameter = m.parameter;
+
+-- Ingest batches already applied, keyed by Idempotency-Key or content hash.
+-- Lets retried batches short-circuit instead of rewriting identical rows.
+CREATE TABLE IF NOT EXISTS swl.ingest_batches (
+  batch_key     TEXT         NOT NULL,
+  content_hash  TEXT         NOT NULL,
+  source        TEXT         NOT NULL,
+  parameter     TEXT         NOT NULL,
+  rows          INTEGER      NOT NULL,
+  response      JSONB        NOT NULL,
+  received_at   TIMESTAMPTZ  NOT NULL DEFAULT now(),
+  CONSTRAINT ingest_batches_pk PRIMARY KEY (batch_key)
+);
+
+CREATE INDEX IF NOT EXISTS ingest_batches_received_idx
+  ON swl.ingest_batches (received_at);
+
 -- Optional: enable compression to reduce storage; uncomment as needed
 -- ALTER TABLE swl.raw_measurements SET (
 --   timescaledb.compress,